@@ -1,146 +1,18 @@
+from itertools import product
+
 import manimlib.imports as mn
 from manimlib.imports import UP, RIGHT, LEFT, DOWN
-import numpy as np
-import pygraphviz as pgv
-from pylatex.utils import escape_latex
-
-
-class Node(mn.Circle):
-    CONFIG = {
-        'radius': 0.3,
-    }
-
-
-class GraphArrow(mn.Arrow):
-    CONFIG = {
-        #  'stroke_width': 3,
-        #  'tip_length': 0.4,
-        #  "max_tip_length_to_length_ratio": 0.2,
-    }
-
-
-dot_to_manim_colors = {
-    'white': mn.WHITE,
-    'DimGray': mn.LIGHT_COLOR,
-    '': mn.WHITE,
-    'lightgray': mn.LIGHT_COLOR,
-}
-
-
-def scale_ratio_and_shift(graph):
-    """
-    Compute the ratio and shift by wich we need to rescale and move the graph's
-    graphviz positions so that it fits in manim's scene.
-    """
-    (min_x, min_y) = (float('+inf'), float('+inf'))
-    (max_x, max_y) = (float('-inf'), float('-inf'))
-    for node in graph.nodes():
-        x, y = map(float, node.attr['pos'].split(','))
-        min_x, min_y = min(min_x, x), min(min_y, y)
-        max_x, max_y = max(max_x, x), max(max_y, y)
-    for edge in graph.edges():
-        # edge.attr['pos'] contains a list of spline control points of the
-        # form: 'e,x1,y1 x2,y2 x3,y3 x4,y4 […]'
-        points = [
-            (float(x), float(y)) for x, y in
-            [point.split(',') for point in
-                edge.attr['pos'][2:].split()]
-        ]
-        # also consider the label's position
-        if 'lp' in edge.attr and edge.attr['lp']:
-            points.append(map(float, edge.attr['lp'].split(',')))
-        for x, y in points:
-            min_x, min_y = min(min_x, x), min(min_y, y)
-            max_x, max_y = max(max_x, x), max(max_y, y)
-
-    width = max_x - min_x
-    height = max_y - min_y
-
-    ratio = min(mn.FRAME_WIDTH / width, mn.FRAME_HEIGHT / height)
-    # last adjustment: the previous ration only allows for each node's *center*
-    # to be in screen, so we need to factor in the manim's rendered circle
-    # radius and stroke width
-    ratio *= mn.FRAME_WIDTH \
-        / (mn.FRAME_WIDTH
-            + 2 * Node.CONFIG['radius']
-            + mn.Circle().stroke_width / 2)
-
-    center = np.array([
-        (max_x + min_x) * ratio / 2,
-        (max_y + min_y) * ratio / 2,
-        0
-    ])
-
-    return ratio, -center
-
-
-rendered_graphs = 0
-
-
-def dot_to_vgroup(source):
-    A = pgv.AGraph(source)
-    A.layout(prog='dot')
-
-    # DEBUG: draw the dot layout in png files
-    global rendered_graphs
-    A.draw(f'{rendered_graphs}.png')
-    rendered_graphs += 1
-
-    ratio, shift = scale_ratio_and_shift(A)
-
-    # spawn each node in manim using the graphviz positions and our rescaling
-    # ratio
-    mnodes = []
-    for node in A.iternodes():
-        # 'point' shaped nodes aren't real nodes, they often represent the
-        # origin of the arrow of an initial stat or the destination of the
-        # arrow of a final state
-        if node.attr['shape'] == 'point':
-            continue
-
-        x, y = map(lambda s: float(s), node.attr['pos'].split(','))
-        pos = np.array([x*ratio, y*ratio, 0])
-
-        # Try to translate graphviz color to manim, fallback to white
-        color = dot_to_manim_colors.get(
-            node.attr.get('fillcolor', 'white'),
-            mn.WHITE
-        )
-
-        # Render the node's label and circle
-        mlabel = mn.TextMobject(escape_latex(node.name)).move_to(pos)
-        mcircle = Node(arc_center=pos, color=color)
-        mnodes.append(mn.VGroup(mcircle, mlabel))
-
-    # spawn each edges in a similar way
-    medges = []
-    for edge in A.edges():
-        # edge.attr['pos'] contains a list of spline control points of the
-        # form: 'e,x1,y1 x2,y2 x3,y3 x4,y4 […]'
-        spline_points = [
-            np.array([float(x)*ratio, float(y)*ratio, 0]) for x, y in
-            [point.split(',') for point in
-                edge.attr['pos'][2:].split()[1:]]
-        ]
 
-        # Try to translate graphviz color to manim, fallback to white
-        color = dot_to_manim_colors.get(
-            edge.attr.get('color', 'white'),
-            mn.WHITE
-        )
-
-        # Render the edge's label and path
-        mpath = mn.VMobject(color=color).set_points_smoothly(spline_points)
-        if 'label' in edge.attr and edge.attr['label']:
-            (labelx, labely) = map(float, edge.attr['lp'].split(','))
-            mlabel = mn.TextMobject(escape_latex(edge.attr['label']))
-            mlabel.scale(0.65)
-            mlabel.move_to(np.array([labelx*ratio, labely*ratio, 0]))
-            medges.append(mn.VGroup(mpath, mlabel))
-        else:
-            medges.append(mpath)
-        print(len(spline_points))
-    return mn.VGroup(*mnodes, *medges).shift(shift)
+import diagnostics
+from automaton_model import (
+    AutomatonModel, RunHighlight, determinization_progression,
+    minimization_progression,
+)
+from culling import CulledGroup, CullingCamera
+from graph_mobjects import (
+    dot_to_vgroup, iter_progression, play_progression,
+)
+from rendering import FrozenBackground, SegmentCache, StaticWait
 
 
 A_source = r'''
@@ -520,7 +392,8 @@ digraph
 ]
 
 
-class Automaton(mn.Scene):
+class Automaton(SegmentCache, StaticWait, FrozenBackground,
+        mn.Scene):
     def construct(self):
         #  mA = dot_to_vgroup(A_source)
         #  mA_complement = dot_to_vgroup(Acomplement_source)
@@ -537,14 +410,88 @@ class Automaton(mn.Scene):
 
         #  self.wait()
 
-        mD = dot_to_vgroup(C_progression[0])
-        self.play(mn.ShowCreation(mD))
+        # the next steps are prepared in the background while the current one
+        # is being rendered
+        play_progression(
+            self, iter_progression(C_progression, incremental=True)
+        )
+
+
+class ZoomedAutomaton(mn.MovingCameraScene):
+    """
+    Pan and zoom over the last step of a progression, only rasterizing the
+    nodes and edges in view, see culling.py.
+    """
+    CONFIG = {
+        'camera_class': CullingCamera,
+    }
+
+    def construct(self):
+        mD = CulledGroup(*dot_to_vgroup(C_progression[-1]))
+        self.add(mD)
         self.wait()
-        self.remove(mD)
-        for source in C_progression[1:]:
-            next_mD = dot_to_vgroup(source)
-            self.play(mn.Transform(mD, next_mD))
+        frame = self.camera_frame
+        frame.save_state()
+        for element in mD.elements[:3]:
+            frame.generate_target()
+            frame.target.set_width(4 * element.get_width())
+            frame.target.move_to(element)
+            self.play(mn.MoveToTarget(frame))
             self.wait()
-            self.remove(mD)
-            self.remove(next_mD)
-            mD = next_mD
+        self.play(mn.Restore(frame))
+        self.wait()
+
+
+class AutomatonRun(mn.Scene):
+    """
+    Run every word up to max_length letters through the last step of a
+    progression at once, then play the run of one of them over the graph.
+    """
+    CONFIG = {
+        'max_length': 8,
+        'word': 'abaab',
+    }
+
+    def construct(self):
+        source = C_progression[-1]
+        model = AutomatonModel.from_dot(source)
+        words = [
+            ''.join(letters)
+            for length in range(self.max_length + 1)
+            for letters in product(model.alphabet, repeat=length)
+        ]
+        accepted = model.accepts(model.encode_words(words))
+        if diagnostics.sink.enabled:
+            diagnostics.sink.message(
+                f'{accepted.sum()} of {len(words)} words accepted'
+            )
+
+        mD = dot_to_vgroup(source)
+        self.play(mn.ShowCreation(mD))
+        states = model.run(model.encode_words([self.word]))[:, 0]
+        highlight = RunHighlight(mD, model, states)
+        self.add(highlight)
+        self.wait(len(states) * highlight.step_duration)
+
+
+class Determinization(mn.Scene):
+    """
+    Subset construction of the first automaton of D_progression, one
+    explored subset per step, the steps being generated rather than
+    hand-written.
+    """
+    def construct(self):
+        play_progression(self, iter_progression(
+            determinization_progression(D_progression[0]), incremental=True
+        ))
+
+
+class Minimization(mn.Scene):
+    """
+    Hopcroft minimization of the next to last step of C_progression, one
+    split per step, the steps being generated rather than hand-written.
+    """
+    def construct(self):
+        play_progression(self, iter_progression(
+            minimization_progression(C_progression[-2]), incremental=True
+        ))
@@ -0,0 +1,458 @@
+"""
+Automata as NumPy transition tables, built from the same DOT sources we
+render.
+
+The DOT sources follow vcsn's conventions: the alphabet is given by the
+graph's vcsn_context attribute, e.g. "letterset<char_letters(ab)>, b",
+edges are labeled with letters and letter classes such as "a, b", "[^a]",
+"[c-e]" or "[^]", and initial and final states are marked by edges from
+I* and to F* point nodes.
+"""
+import re
+
+import manimlib.imports as mn
+import numpy as np
+import pygraphviz as pgv
+
+
+def context_alphabet(context):
+    """
+    Return the letters of a vcsn context, e.g. ['a', 'b'] for
+    "letterset<char_letters(ab)>, b".
+    """
+    match = re.search(r'char_letters\(([^)]*)\)', context)
+    if match is None:
+        raise ValueError(f'Unsupported vcsn context: {context}')
+    return list(match.group(1))
+
+
+LABEL_TOKEN = re.compile(r'\[(\^?)((?:\\.|[^\]])*)\]|\\(.)|([^,\s])')
+
+
+def class_letters(members, alphabet):
+    """
+    Return the letters of the alphabet in a letter class' contents, e.g. 'c-e'
+    or 'ab'.
+    """
+    letters = set()
+    for start, end in re.findall(r'(\\?.)(?:-(\\?.))?', members):
+        start = start[-1]
+        if end:
+            letters.update(
+                letter for letter in alphabet
+                if start <= letter <= end[-1]
+            )
+        else:
+            letters.add(start)
+    return letters
+
+
+def label_letters(label, alphabet):
+    """
+    Return the set of letters of an edge label such as "a, b", "[^a]" or
+    "[c-e]".
+    """
+    letters = set()
+    for negated, members, escaped, letter in LABEL_TOKEN.findall(label):
+        if letter or escaped:
+            letters.add(letter or escaped)
+        elif negated:
+            letters.update(set(alphabet) - class_letters(members, alphabet))
+        else:
+            letters.update(class_letters(members, alphabet))
+    return letters
+
+
+class AutomatonModel:
+    """
+    Automaton over `alphabet` with n states named `names`, the DOT node
+    names, and labeled `labels`, by default their names. transitions is a
+    (n_letters, n, n) boolean array, transitions[a, i, j] telling whether
+    there's an edge from state i to state j on letter a; initial and final are
+    (n,) boolean masks.
+    """
+    def __init__(self, alphabet, names, transitions, initial, final,
+                 labels=None):
+        self.alphabet = list(alphabet)
+        self.names = list(names)
+        self.labels = self.names if labels is None else list(labels)
+        self.transitions = transitions
+        self.initial = initial
+        self.final = final
+
+    @property
+    def n_states(self):
+        return len(self.names)
+
+    @classmethod
+    def from_agraph(cls, graph):
+        alphabet = context_alphabet(graph.graph_attr.get('vcsn_context', ''))
+        points = {
+            node.name for node in graph.iternodes()
+            if node.attr.get('shape') == 'point'
+        }
+        nodes = [node for node in graph.iternodes() if node.name not in points]
+        names = [node.name for node in nodes]
+        labels = [
+            (node.attr.get('label') or '\\N').replace('\\N', node.name)
+            for node in nodes
+        ]
+        index = {name: i for i, name in enumerate(names)}
+        letter_index = {letter: i for i, letter in enumerate(alphabet)}
+
+        transitions = np.zeros((len(alphabet),) + (len(names),) * 2, bool)
+        initial = np.zeros(len(names), bool)
+        final = np.zeros(len(names), bool)
+        for edge in graph.edges():
+            tail, head = edge
+            if tail in points:
+                initial[index[head]] = True
+            elif head in points:
+                final[index[tail]] = True
+            else:
+                label = edge.attr.get('label') or ''
+                for letter in label_letters(label, alphabet):
+                    transitions[letter_index[letter], index[tail],
+                                index[head]] = True
+        return cls(alphabet, names, transitions, initial, final, labels)
+
+    @classmethod
+    def from_dot(cls, source):
+        return cls.from_agraph(pgv.AGraph(source))
+
+    def is_deterministic(self):
+        return self.initial.sum() <= 1 \
+            and (self.transitions.sum(axis=2) <= 1).all()
+
+    def table(self):
+        """
+        Return the (n_letters, n) successor of each state on each letter of a
+        deterministic automaton, -1 where there's none.
+        """
+        has_successor = self.transitions.any(axis=2)
+        return np.where(has_successor, self.transitions.argmax(axis=2), -1)
+
+    def encode_words(self, words):
+        """
+        Return a (W, T) array of the letter indices of the given words,
+        padded with -1 to the length of the longest one.
+        """
+        letter_index = {letter: i for i, letter in enumerate(self.alphabet)}
+        length = max((len(word) for word in words), default=0)
+        encoded = np.full((len(words), length), -1, dtype=np.int64)
+        for w, word in enumerate(words):
+            encoded[w, :len(word)] = [letter_index[letter] for letter in word]
+        return encoded
+
+    def run(self, words):
+        """
+        Run the automaton on a batch of words, given as encode_words does,
+        and return the (T + 1, W, n) boolean state vectors after each letter,
+        words that ended keeping their last one.
+        """
+        words = np.asarray(words)
+        n_words, length = words.shape
+        states = np.empty((length + 1, n_words, self.n_states), bool)
+        states[0] = self.initial
+        # as floats, the words reading the same letter step with one matrix
+        # product
+        transitions = self.transitions.astype(np.float32)
+        for t in range(length):
+            letters = words[:, t]
+            states[t + 1] = states[t]
+            for letter, transition in enumerate(transitions):
+                reading = letters == letter
+                if reading.any():
+                    states[t + 1, reading] = \
+                        states[t, reading].astype(np.float32) @ transition > 0
+        return states
+
+    def accepts(self, words):
+        """
+        Return whether each of a batch of encoded words is accepted.
+        """
+        return (self.run(words)[-1] & self.final).any(axis=1)
+
+    def edge_labels(self):
+        """
+        Return the label of each (tail, head) pair of states with transitions
+        between them, letters being listed in alphabet order.
+        """
+        labels = {}
+        letters, tails, heads = np.nonzero(self.transitions)
+        for tail, head, letter in sorted(zip(tails, heads, letters)):
+            labels.setdefault((tail, head), []).append(self.alphabet[letter])
+        return {
+            key: '[^]' if len(value) == len(self.alphabet) > 2
+            else ', '.join(value)
+            for key, value in labels.items()
+        }
+
+    def to_dot(self):
+        """
+        Return the DOT source of this automaton, in the style of our
+        hand-written sources.
+        """
+        context = f"letterset<char_letters({''.join(self.alphabet)})>, b"
+        ids = [dot_id(name) for name in self.names]
+        initial = np.nonzero(self.initial)[0]
+        final = np.nonzero(self.final)[0]
+        lines = [
+            'digraph',
+            '{',
+            f'  vcsn_context = "{context}"',
+            '  rankdir = LR',
+            '  edge [arrowhead = vee, arrowsize = .6]',
+            '  {',
+            '    node [shape = point, width = 0]',
+            *[f'    I{i}' for i in initial],
+            *[f'    F{i}' for i in final],
+            '  }',
+            '  {',
+            '    node [shape = circle, style = rounded, width = 0.5]',
+            *[f'    {id} [label = "{label}", shape = box]'
+              for id, label in zip(ids, self.labels)],
+            '  }',
+        ]
+        lines.extend(f'  I{i} -> {ids[i]}' for i in initial)
+        edges = {}
+        for (tail, head), label in self.edge_labels().items():
+            edges.setdefault(tail, []).append(
+                f'  {ids[tail]} -> {ids[head]} [label = "{label}"]'
+            )
+        for i in range(self.n_states):
+            if self.final[i]:
+                lines.append(f'  {ids[i]} -> F{i}')
+            lines.extend(edges.get(i, []))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+
+def dot_id(name):
+    """
+    Return name as a DOT identifier, quoted unless it's a plain number or
+    word.
+    """
+    if re.fullmatch(r'[0-9]+|[A-Za-z_][A-Za-z_0-9]*', name):
+        return name
+    return '"' + name.replace('"', '\\"') + '"'
+
+
+def determinize(model):
+    """
+    Subset construction of an automaton, yielding the DFA built so far after
+    each explored subset. Only accessible subsets are built, missing
+    transitions standing for the empty one. DFA states are named after the
+    labels of the states of their subset, e.g. "0, 1, 3", so that each one
+    keeps its name, hence its place in incremental layouts, from step to
+    step.
+
+    Subsets are NumPy bool rows over the states of model, indexed by their
+    packed bytes; the successors of a subset on every letter are found at
+    once.
+    """
+    subsets = [model.initial.copy()]
+    index = {np.packbits(model.initial).tobytes(): 0}
+    names = [subset_name(model, model.initial)]
+    tails, letters, heads = [], [], []
+    for explored, subset in enumerate(subsets):
+        successors = model.transitions[:, subset, :].any(axis=1)
+        for letter, successor in enumerate(successors):
+            if not successor.any():
+                continue
+            key = np.packbits(successor).tobytes()
+            if key not in index:
+                index[key] = len(subsets)
+                subsets.append(successor)
+                names.append(subset_name(model, successor))
+            tails.append(explored)
+            letters.append(letter)
+            heads.append(index[key])
+
+        n = len(subsets)
+        transitions = np.zeros((len(model.alphabet), n, n), bool)
+        transitions[letters, tails, heads] = True
+        initial = np.zeros(n, bool)
+        initial[0] = True
+        final = np.array([(row & model.final).any() for row in subsets])
+        yield AutomatonModel(
+            model.alphabet, names[:], transitions, initial, final
+        )
+
+
+def subset_name(model, subset):
+    return ', '.join(model.labels[i] for i in np.nonzero(subset)[0])
+
+
+def determinization_progression(source):
+    """
+    Return the DOT sources of the steps of the determinization of the
+    automaton of the given DOT source, starting with the automaton itself,
+    ready for iter_progression.
+    """
+    model = AutomatonModel.from_dot(source)
+    return [source] + [dfa.to_dot() for dfa in determinize(model)]
+
+
+def predecessors(table):
+    """
+    Return, for each letter, the predecessors of every state in a complete
+    (n_letters, n) table, as CSR arrays: the predecessors of q on letter a
+    are order[a, starts[a, q]:starts[a, q + 1]].
+    """
+    n = table.shape[1]
+    order = np.argsort(table, axis=1, kind='stable')
+    starts = np.array([
+        np.searchsorted(row[row_order], np.arange(n + 1))
+        for row, row_order in zip(table, order)
+    ])
+    return order, starts
+
+
+def minimize(model):
+    """
+    Hopcroft's partition refinement of a deterministic automaton, yielding
+    the quotient of the model by the current partition after each split,
+    the last one being the minimal automaton. Quotient states are named
+    after the labels of the states of their block, e.g. "{3}, {1, 4, 5}".
+
+    A partial model is completed with a sink state, which quotients leave
+    out along with the transitions to it; splits only isolating the sink
+    aren't yielded. Runs in O(n_letters n log n): a split costs the size of
+    the part moved to a new block, and the splitters queued are the smaller
+    halves. Raises ValueError if the model isn't deterministic.
+    """
+    if not model.is_deterministic():
+        raise ValueError('Only deterministic automata can be minimized')
+    table = model.table()
+    n_letters, n = table.shape
+    final = model.final
+    if (table < 0).any():
+        table = np.column_stack([np.where(table < 0, n, table),
+                                 np.full(n_letters, n)])
+        final = np.append(final, False)
+    order, starts = predecessors(table)
+
+    blocks = [set(np.nonzero(final)[0]), set(np.nonzero(~final)[0])]
+    blocks = [block for block in blocks if block]
+    block_of = np.zeros(len(final), dtype=int)
+    for b, block in enumerate(blocks):
+        block_of[list(block)] = b
+    smallest = min(range(len(blocks)), key=lambda b: len(blocks[b]))
+    waiting = {(smallest, letter) for letter in range(n_letters)}
+    yield quotient(model, table, block_of)
+
+    while waiting:
+        splitter, letter = waiting.pop()
+        # a deterministic table has no state twice among the predecessors
+        incoming = np.concatenate([[]] + [
+            order[letter, starts[letter, q]:starts[letter, q + 1]]
+            for q in blocks[splitter]
+        ]).astype(int)
+        touched = {}
+        for q in incoming:
+            touched.setdefault(block_of[q], []).append(q)
+        for b, inside in touched.items():
+            if len(inside) == len(blocks[b]):
+                continue
+            new = len(blocks)
+            blocks[b].difference_update(inside)
+            blocks.append(set(inside))
+            block_of[inside] = new
+            for c in range(n_letters):
+                if (b, c) in waiting:
+                    waiting.add((new, c))
+                else:
+                    waiting.add(
+                        (new if len(inside) <= len(blocks[b]) else b, c)
+                    )
+            # isolating the sink leaves the quotient as it was
+            if {n} not in (blocks[b], blocks[new]):
+                yield quotient(model, table, block_of)
+
+
+def quotient(model, table, block_of):
+    """
+    Return the quotient of model by the partition of the states of its
+    complete table in block_of, blocks of the sink state alone left out.
+    """
+    n = model.n_states
+    # number the blocks in the order of their first states
+    _, first = np.unique(block_of[:n], return_index=True)
+    numbering = np.full(block_of.max() + 1, -1)
+    numbering[block_of[np.sort(first)]] = np.arange(len(first))
+    states = numbering[block_of[:n]]
+
+    m = len(first)
+    transitions = np.zeros((len(model.alphabet), m, m), bool)
+    letters, tails = np.nonzero(table[:, :n] < n)
+    transitions[letters, states[tails], states[table[letters, tails]]] = True
+    initial = np.zeros(m, bool)
+    initial[states[model.initial]] = True
+    final = np.zeros(m, bool)
+    final[states[model.final]] = True
+    names = [
+        ', '.join(f'{{{model.labels[q]}}}' for q in np.nonzero(states == b)[0])
+        for b in range(m)
+    ]
+    return AutomatonModel(model.alphabet, names, transitions, initial, final)
+
+
+def minimization_progression(source):
+    """
+    Return the DOT sources of the steps of the minimization of the
+    deterministic automaton of the given DOT source, starting with the
+    automaton itself, ready for iter_progression.
+    """
+    model = AutomatonModel.from_dot(source)
+    return [source] + [step.to_dot() for step in minimize(model)]
+
+
+class RunHighlight(mn.VMobject):
+    """
+    Highlight of the active states of a run over a rendered automaton:
+    `states` is the (T + 1, n) boolean state vectors of one word, as
+    AutomatonModel.run returns them, played step_duration seconds per letter.
+
+    The circles of all the states are gathered once from vgroup, the
+    dot_to_vgroup rendering of the automaton, into a single buffer; every
+    frame then just selects the points of the active states.
+    """
+    CONFIG = {
+        'color': mn.YELLOW,
+        'stroke_width': 6,
+        'step_duration': 0.5,
+    }
+
+    def __init__(self, vgroup, model, states, **kwargs):
+        elements = {
+            element.dot_key: element for element in vgroup
+            if hasattr(element, 'dot_key')
+        }
+        circles = [
+            elements[name].family_members_with_points()[0].points
+            for name in model.names
+        ]
+        self.circle_points = np.concatenate(circles)
+        self.state_of_point = np.repeat(
+            np.arange(len(circles)), [len(c) for c in circles]
+        )
+        self.states = states
+        self.time = 0
+        mn.VMobject.__init__(self, **kwargs)
+        self.set_step(0)
+        self.add_updater(lambda m, dt: m.advance(dt))
+
+    def set_states(self, states):
+        self.states = states
+        self.time = 0
+        return self.set_step(0)
+
+    def advance(self, dt):
+        self.time += dt
+        return self.set_step(int(self.time / self.step_duration))
+
+    def set_step(self, step):
+        active = self.states[min(step, len(self.states) - 1)]
+        self.points = self.circle_points[active[self.state_of_point]]
+        return self
@@ -0,0 +1,189 @@
+"""
+Generator of N-stage ripple chains of the \\sub subtractor symbol.
+
+Stages are stacked vertically, each stage's borrow output Ro feeding the
+borrow input Ri of the stage below it. Everything is computed with NumPy in
+TikZ units from the pin coordinates of the \\sub macro, then mapped into the
+scene through the bounding box of the compiled symbol:
+
+- the stages are instances of a single InstanceTemplate of the symbol,
+- all the wires form one multi-subpath VMobject,
+- all the labels come from one batched compile.
+"""
+import manimlib.imports as mn
+import numpy as np
+
+import tex_labels
+from instancing import InstanceTemplate
+
+
+# pin ends of the \sub macro, in TikZ units relative to the stage origin
+SUB_PINS = {
+    'Ri': (0.75, 2.25),
+    'A': (-0.25, 1.25),
+    'B': (-0.25, 0.5),
+    'S': (1.75, 1.25),
+    'Ro': (1.75, 0.5),
+}
+
+# lower left and upper right corners of the \sub symbol, pins included
+SUB_BOUNDS = np.array([(-0.25, 0, 0), (1.75, 2.25, 0)])
+
+
+def polylines_to_points(polylines):
+    """
+    Turn a (n, k, 3) array of n polylines of k corners each into manim's four
+    points per cubic curve, each polyline becoming a subpath made of k - 1
+    straight curves.
+    """
+    starts = polylines[:, :-1].reshape(-1, 3)
+    ends = polylines[:, 1:].reshape(-1, 3)
+    alphas = np.linspace(0, 1, 4)[np.newaxis, :, np.newaxis]
+    return (
+        starts[:, np.newaxis] + alphas * (ends - starts)[:, np.newaxis]
+    ).reshape(-1, 3)
+
+
+class RippleChain:
+    """
+    Geometry of a chain of n \\sub stages, in TikZ units, stage i having its
+    origin at (0, -i * pitch). Wire leads to the chain's inputs and outputs
+    are `lead` long, the borrow links run `route` to the right of the Ro
+    pins.
+    """
+    def __init__(self, n, pitch=2.75, lead=0.5, route=0.15):
+        self.n = n
+        self.pitch = pitch
+        self.lead = lead
+        self.route = route
+        self.origins = np.zeros((n, 3))
+        self.origins[:, 1] = -pitch * np.arange(n)
+
+    def pin(self, name):
+        """
+        Return the (n, 3) positions of the given pin of every stage.
+        """
+        return self.origins + np.array(SUB_PINS[name] + (0,))
+
+    def leads(self, name, direction):
+        """
+        Return (n, 2, 3) polylines from the given pin of every stage to its
+        lead end, `lead` away in the given direction.
+        """
+        pins = self.pin(name)
+        return np.stack([pins, pins + self.lead * direction], axis=1)
+
+    def links(self):
+        """
+        Return (n - 1, 4, 3) polylines from each Ro pin to the Ri pin of the
+        next stage, going right, down, then left.
+        """
+        ro = self.pin('Ro')[:-1]
+        ri = self.pin('Ri')[1:]
+        corner_x = ro[:, 0] + self.route
+        bend1 = np.column_stack([corner_x, ro[:, 1], ro[:, 2]])
+        bend2 = np.column_stack([corner_x, ri[:, 1], ri[:, 2]])
+        return np.stack([ro, bend1, bend2, ri], axis=1)
+
+    def wire_groups(self):
+        """
+        Return the wires of the chain as (signal names, polylines) groups,
+        signals being named as in logic.subtractor_network.
+        """
+        n = self.n
+        return [
+            ([f'A{i}' for i in range(n)], self.leads('A', mn.LEFT)),
+            ([f'B{i}' for i in range(n)], self.leads('B', mn.LEFT)),
+            ([f'S{i}' for i in range(n)], self.leads('S', mn.RIGHT)),
+            (['R-1'], self.leads('Ri', mn.UP)[:1]),
+            ([f'R{n - 1}'], self.leads('Ro', mn.RIGHT)[-1:]),
+            ([f'R{i}' for i in range(n - 1)], self.links()),
+        ]
+
+    def wire_points(self):
+        """
+        Return the points of all the wires of the chain, as a single
+        multi-subpath VMobject expects them.
+        """
+        return np.concatenate([
+            polylines_to_points(polylines)
+            for _, polylines in self.wire_groups()
+        ])
+
+    def wire_signals(self):
+        """
+        Return the signal name and the number of points in wire_points() of
+        each wire of the chain.
+        """
+        names, counts = [], []
+        for group_names, polylines in self.wire_groups():
+            names.extend(group_names)
+            counts.extend([4 * (polylines.shape[1] - 1)] * len(polylines))
+        return names, counts
+
+    def labels(self):
+        """
+        Return the TeX string, lead end position and direction of every
+        label of the chain.
+        """
+        labels = []
+        for pin, direction, name in [
+                ('A', mn.LEFT, 'A'), ('B', mn.LEFT, 'B'),
+                ('S', mn.RIGHT, 'S')]:
+            ends = self.pin(pin) + self.lead * direction
+            labels.extend(
+                (f'{name}_{{{i}}}', end, direction)
+                for i, end in enumerate(ends)
+            )
+        labels.append(('0', self.pin('Ri')[0] + self.lead * mn.UP, mn.UP))
+        labels.append((
+            f'R_{{{self.n - 1}}}',
+            self.pin('Ro')[-1] + self.lead * mn.RIGHT,
+            mn.RIGHT,
+        ))
+        return labels
+
+
+def tikz_to_scene(symbol):
+    """
+    Return the function mapping TikZ units to scene coordinates, as found
+    from the bounding box of the compiled \\sub symbol at its current place.
+    """
+    ratio = symbol.get_width() / (SUB_BOUNDS[1, 0] - SUB_BOUNDS[0, 0])
+    lower_left = symbol.get_corner(mn.DL)
+
+    def to_scene(points):
+        return (points - SUB_BOUNDS[0]) * ratio + lower_left
+    return to_scene
+
+
+def chain_mobjects(n, symbol, factory=None, stroke_width=0.8, buff=0.1):
+    """
+    Build a chain of n stages from the \\sub symbol as compiled, not
+    rescaled yet, and return the VGroups of its stages, wires and labels.
+    Labels are compiled by factory, a tex_labels.LabelFactory of math labels.
+    """
+    chain = RippleChain(n)
+    to_scene = tikz_to_scene(symbol)
+
+    template = InstanceTemplate(symbol)
+    stages = template.instances(n)
+    for stage, origin in zip(stages, to_scene(chain.origins)):
+        stage.shift(origin - to_scene(np.zeros(3)))
+
+    wires = mn.VMobject(stroke_width=stroke_width)
+    wires.set_points(to_scene(chain.wire_points()))
+
+    if factory is None:
+        factory = tex_labels.LabelFactory(
+            label_class=tex_labels.MathLabelMobject
+        )
+    strings, ends, directions = zip(*chain.labels())
+    # a single compile for all of them, labels typeset along with the TikZ
+    # picture come at the right size without scaling
+    mlabels = factory.labels(list(strings))
+    for mlabel, end, direction in zip(mlabels, to_scene(np.array(ends)),
+                                      directions):
+        mlabel.next_to(end, direction, buff=buff)
+
+    return stages, wires, mn.VGroup(*mlabels)
@@ -0,0 +1,194 @@
+"""
+Viewport culling for panning and zooming over large graphs.
+
+A CulledGroup indexes the bounding boxes of its submobjects, e.g. the nodes
+and edges built by dot_to_vgroup, in a uniform grid once. A CullingCamera
+then only hands the submobjects intersecting its frame to the renderer, so
+that frame time depends on what's on screen rather than on the size of the
+whole graph.
+"""
+import manimlib.imports as mn
+import numpy as np
+
+
+class GridIndex:
+    """
+    Uniform grid over n axis-aligned boxes given by their (n, 2) lower and
+    upper corners, answering which boxes intersect a query box.
+    """
+    def __init__(self, lower, upper, cell_size=None):
+        self.lower = lower
+        self.upper = upper
+        self.origin = lower.min(axis=0)
+        if cell_size is None:
+            # cells about twice as large as the average box
+            sizes = (upper - lower).mean(axis=0)
+            cell_size = 2 * max(sizes.max(), 1e-6)
+        self.cell_size = cell_size
+
+        first = self.cell(lower)
+        last = self.cell(upper)
+        self.cells = {}
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(first, last)):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self.cells.setdefault((x, y), []).append(i)
+
+    def __len__(self):
+        return len(self.lower)
+
+    def cell(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def query(self, lower, upper):
+        """
+        Return the sorted indices of the boxes intersecting the box from
+        lower to upper.
+        """
+        (x0, y0), (x1, y1) = self.cell(np.array([lower, upper]))
+        n_cells = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if n_cells > len(self.cells):
+            # zoomed out, testing every box at once is cheaper
+            candidates = np.arange(len(self))
+        else:
+            found = [
+                self.cells.get((x, y), ())
+                for x in range(x0, x1 + 1)
+                for y in range(y0, y1 + 1)
+            ]
+            candidates = np.unique(np.concatenate([[], *found]).astype(int))
+        hits = np.all(
+            (self.lower[candidates] <= upper)
+            & (self.upper[candidates] >= lower),
+            axis=1,
+        )
+        return candidates[hits]
+
+
+class CulledGroup(mn.VGroup):
+    """
+    VGroup whose submobjects a CullingCamera only displays when their
+    bounding box intersects its frame. CulledGroups must be added to the
+    scene directly, not nested in other groups.
+
+    Submobjects are indexed once, at their place at the time. Moving or
+    scaling the whole group afterwards is tracked by two anchor points moving
+    along with it, rotating it isn't. Submobjects moved individually, e.g. by
+    a Transform, are culled where they were indexed: animate such changes
+    uncull()ed, or reindex() after them. Likewise, only the submobjects that
+    had updaters when indexed get updated.
+    """
+    def __init__(self, *mobjects, **kwargs):
+        mn.VGroup.__init__(self, *mobjects, **kwargs)
+        self.anchors = None
+        self.culling = True
+        self.reindex()
+
+    def reindex(self):
+        if self.anchors is not None:
+            self.remove(self.anchors)
+        # submobjects without points have nothing to display
+        self.elements = []
+        boxes = []
+        for mobject in self.submobjects:
+            members = mobject.family_members_with_points()
+            if members:
+                points = np.concatenate([m.points for m in members])[:, :2]
+                self.elements.append(mobject)
+                boxes.append((points.min(axis=0), points.max(axis=0)))
+        if boxes:
+            lower, upper = map(np.array, zip(*boxes))
+            self.index = GridIndex(lower, upper)
+            self.indexed_corners = np.array(
+                [lower.min(axis=0) - 1, upper.max(axis=0) + 1]
+            )
+        else:
+            self.index = None
+            self.indexed_corners = np.array([[-1, -1], [1, 1]])
+
+        # two points spanning the indexed area, transformed along with the
+        # group, map the frame back to the index' coordinates
+        self.anchors = mn.VGroup(*[
+            mn.VectorizedPoint(np.append(corner, 0))
+            for corner in self.indexed_corners
+        ])
+        self.add(self.anchors)
+        self.n_indexed = len(self.submobjects)
+        # only those need their updaters run every frame
+        self.updating_elements = [
+            mobject for mobject in self.submobjects
+            if any(m.updaters for m in mobject.get_family())
+        ]
+        return self
+
+    def uncull(self):
+        self.culling = False
+        return self
+
+    def cull(self):
+        self.culling = True
+        return self
+
+    def visible_submobjects(self, lower, upper):
+        """
+        Return the submobjects intersecting the box from lower to upper, in
+        scene coordinates.
+        """
+        if not self.culling or self.index is None:
+            return self.submobjects
+        anchors = np.array([
+            anchor.get_center()[:2] for anchor in self.anchors
+        ])
+        scale = (anchors[1] - anchors[0]) \
+            / (self.indexed_corners[1] - self.indexed_corners[0])
+        corners = self.indexed_corners[0] \
+            + (np.array([lower, upper]) - anchors[0]) / scale
+        visible = [
+            self.elements[i] for i in self.index.query(
+                corners.min(axis=0), corners.max(axis=0)
+            )
+        ]
+        # submobjects added after indexing are always displayed
+        if len(self.submobjects) != self.n_indexed:
+            indexed = set(map(id, self.elements))
+            visible += [
+                m for m in self.submobjects
+                if id(m) not in indexed and m is not self.anchors
+            ]
+        return visible
+
+    def update(self, dt=0, recursive=True):
+        if self.updating_suspended:
+            return self
+        mn.VGroup.update(self, dt, recursive=False)
+        if recursive:
+            for element in self.updating_elements:
+                element.update(dt, recursive)
+        return self
+
+
+class CullingCamera(mn.MovingCamera):
+    """
+    MovingCamera only displaying the submobjects of CulledGroups that
+    intersect its frame, grown by cull_margin of its size on each side.
+    """
+    CONFIG = {
+        'cull_margin': 0.05,
+    }
+
+    def get_mobjects_to_display(self, mobjects, include_submobjects=True,
+                                excluded_mobjects=None):
+        center = self.get_frame_center()[:2]
+        half_size = (1 / 2 + self.cull_margin) * np.array([
+            self.get_frame_width(), self.get_frame_height(),
+        ])
+        lower, upper = center - half_size, center + half_size
+        displayed = []
+        for mobject in mobjects:
+            if isinstance(mobject, CulledGroup):
+                displayed.extend(mobject.visible_submobjects(lower, upper))
+            else:
+                displayed.append(mobject)
+        return mn.MovingCamera.get_mobjects_to_display(
+            self, displayed, include_submobjects, excluded_mobjects
+        )
@@ -0,0 +1,90 @@
+"""
+Pluggable sink for debugging output, such as PNG renders of graphviz layouts.
+
+The default sink does nothing. Setting the AUTOMATON_DIAGNOSTICS environment
+variable to a directory, or calling set_sink(DirectorySink(directory)),
+writes diagnostics under <directory>/<run id>/<process id>/ from a background
+thread, so that several rendering processes never write the same files and
+the render itself never waits on diagnostics.
+"""
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygraphviz as pgv
+
+
+class NullSink:
+    """
+    Diagnostics sink discarding everything.
+    """
+    enabled = False
+
+    def graph(self, source, prog='dot'):
+        pass
+
+    def message(self, text):
+        pass
+
+    def close(self):
+        pass
+
+
+class DirectorySink:
+    """
+    Diagnostics sink drawing graphs as PNG files and appending messages to a
+    log file, in a per run and per process directory.
+    """
+    enabled = True
+
+    def __init__(self, directory, run_id=None):
+        self.base_directory = directory
+        self.run_id = run_id or time.strftime('%Y%m%d-%H%M%S')
+        self._pid = None
+
+    def _start(self):
+        # thread pools don't survive forks, each process gets its own writer
+        # thread, directory and numbering
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.directory = os.path.join(
+            self.base_directory, self.run_id, str(self._pid)
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self.executor = ThreadPoolExecutor(1)
+        self.counter = itertools.count()
+
+    def graph(self, source, prog='dot'):
+        self._start()
+        path = os.path.join(self.directory, f'{next(self.counter):05}.png')
+        self.executor.submit(self._draw, source, prog, path)
+
+    @staticmethod
+    def _draw(source, prog, path):
+        pgv.AGraph(source).draw(path, prog=prog)
+
+    def message(self, text):
+        self._start()
+        self.executor.submit(self._log, text)
+
+    def _log(self, text):
+        with open(os.path.join(self.directory, 'log.txt'), 'a') as f:
+            f.write(text + '\n')
+
+    def close(self):
+        if self._pid == os.getpid():
+            self.executor.shutdown(wait=True)
+
+
+def set_sink(new_sink):
+    global sink
+    sink.close()
+    sink = new_sink
+
+
+if os.environ.get('AUTOMATON_DIAGNOSTICS'):
+    sink = DirectorySink(os.environ['AUTOMATON_DIAGNOSTICS'])
+else:
+    sink = NullSink()
@@ -1,8 +1,21 @@
 import manimlib.imports as mn
 from manimlib.imports import UP, RIGHT, LEFT, DOWN
+from manimlib.utils.config_ops import digest_config
 import numpy as np
 import pygraphviz as pgv
 
+import circuits
+import logic
+import tex_format
+import tex_labels
+import tex_pool
+from instancing import InstanceTemplate, InstancingCamera
+from mobject_cache import MobjectCache
+from rendering import FrozenBackground, SegmentCache, StaticWait
+
+# compile every TikZ picture and formula from precompiled preambles
+tex_format.install()
+
 
 class TikzMobject(mn.TextMobject):
     CONFIG = {
@@ -19,6 +32,34 @@ class TikzMobject(mn.TextMobject):
         'fill_opacity': 0
     }
 
+    # compiled pictures, shared by every run and every rendering process
+    cache = MobjectCache('tikz_mobjects')
+
+    def __init__(self, tikz_source, **kwargs):
+        digest_config(self, kwargs)
+        key = self.cache.key(
+            tikz_source, self.template_tex_file_body, sorted(kwargs.items())
+        )
+        # only one process compiles a given picture, the others wait for it
+        # and load it from the cache
+        with self.cache.lock(key):
+            self._cached = self.cache.load(key)
+            if self._cached is None:
+                mn.TextMobject.__init__(self, tikz_source, **kwargs)
+                self.cache.store(key, self)
+            else:
+                mn.VMobject.__init__(self, **kwargs)
+                self.tex_strings = [tikz_source]
+                self.tex_string = tikz_source
+        del self._cached
+
+    def generate_points(self):
+        cached = getattr(self, '_cached', None)
+        if cached is None:
+            mn.TextMobject.generate_points(self)
+        else:
+            cached.restore(self)
+
 
 subtractor_detailed_source = r'''
 \tikzstyle{branch}=[fill, shape=circle, minimum size=3pt, inner sep=0pt]
@@ -111,18 +152,38 @@ subtractor_source = subtractor_def_source + r'''
 \end{tikzpicture}
 '''
 
+# every formula of the Tikz scene, typeset up front by the TeX pool
+tikz_formulas = [
+    'A_i', 'B_i', 'R_{i-1}', 'S_i', 'R_i', '-',
+    *[str(digit) for digit in range(10)],
+]
+
+
+class Tikz(SegmentCache, StaticWait, FrozenBackground,
+        mn.Scene):
+    CONFIG = {
+        'camera_class': InstancingCamera,
+        'n_bits': 4,
+    }
 
-class Tikz(mn.Scene):
     def construct(self):
+        # typeset every formula at once, then hand out copies
+        formulas = tex_labels.LabelFactory(
+            label_class=tex_labels.MathLabelMobject,
+            svg_files=tex_pool.default_pool.svg_files,
+        )
+        formulas.labels(tikz_formulas)
+        tex = formulas.label
+
         # Detailed design of the subtractor
         sub_wiring = TikzMobject(subtractor_detailed_source).scale(0.5)
-        input_a = mn.TexMobject("A_i") \
+        input_a = tex("A_i") \
             .move_to(sub_wiring.get_center() + 2.8 * UP + 5.3 * LEFT)
-        input_b = mn.TexMobject("B_i").next_to(input_a, mn.RIGHT)
-        input_r = mn.TexMobject("R_{i-1}").next_to(input_b, mn.RIGHT)
-        output_s = mn.TexMobject("S_i") \
+        input_b = tex("B_i").next_to(input_a, mn.RIGHT)
+        input_r = tex("R_{i-1}").next_to(input_b, mn.RIGHT)
+        output_s = tex("S_i") \
             .move_to(sub_wiring.get_center() + 5.7 * RIGHT + 0.9 * UP)
-        output_r = mn.TexMobject("R_i") \
+        output_r = tex("R_i") \
             .move_to(sub_wiring.get_center() + 5.7 * RIGHT + 2.3 * DOWN)
         sub_detailed = mn.VGroup(sub_wiring, input_a, input_b, input_r,
                                     output_s, output_r)
@@ -132,15 +193,15 @@ class Tikz(mn.Scene):
 
         # Simplfied symbol for the subtractor
         sub_symbol = TikzMobject(subtractor_source)
-        input_a = mn.TexMobject("A_i") \
+        input_a = tex("A_i") \
             .move_to(sub_symbol.get_center() + 0.7 * LEFT + 0.2 * UP)
-        input_b = mn.TexMobject("B_i") \
+        input_b = tex("B_i") \
             .move_to(input_a.get_center() + 1.1 * DOWN)
-        input_r = mn.TexMobject("R_{i-1}") \
+        input_r = tex("R_{i-1}") \
             .move_to(sub_symbol.get_center() + 0.9 * UP)
-        output_s = mn.TexMobject("S_i") \
+        output_s = tex("S_i") \
             .move_to(sub_symbol.get_center() + 0.7 * RIGHT + 0.2 * UP)
-        output_r = mn.TexMobject("R_i") \
+        output_r = tex("R_i") \
             .move_to(output_s.get_center() + 1.1 * DOWN)
         sub = mn.VGroup(sub_symbol, input_a, input_b, input_r,
                            output_s, output_r)
@@ -148,93 +209,32 @@ class Tikz(mn.Scene):
         self.play(mn.Transform(sub_detailed, sub))
         self.wait()
 
-        # Draw the four subtractors
-        sub1 = sub.copy().scale(0.3).move_to(2.5*UP)
-        self.remove(sub_detailed)  # why is it needed?
-        self.play(mn.Transform(sub, sub1))
-        sub2 = sub1.copy().next_to(sub1, DOWN)
-        sub3 = sub2.copy().next_to(sub2, DOWN)
-        sub4 = sub3.copy().next_to(sub3, DOWN)
-        subs = [sub1, sub2, sub3, sub4]
-        self.play(*[mn.ShowCreation(obj) for obj in subs[1:]])
-
-        # Link them
-        links = []
-        for i in range(3):
-            src = subs[i]
-            dst = subs[i+1]
-            down = mn.Line(
-                src.get_center() + 0.43*RIGHT + 0.26*DOWN,
-                dst.get_center() + 0.43*RIGHT + 0.48*UP,
-                stroke_width=0.8
-            )
-            left = mn.Line(
-                dst.get_center() + 0.43*RIGHT + 0.48*UP,
-                dst.get_center() + 0.48*UP,
-                stroke_width=0.8
-            )
-            links.append(mn.VGroup(down, left))
-        self.play(*[mn.ShowCreation(link) for link in links])
-
-        # Link inputs
-        r0 = mn.TextMobject("0") \
-            .scale(0.3) \
-            .move_to(sub1.get_center() + 0.7 * UP)
-        r0_line = mn.Line(
-            sub1.get_center() + 0.47*UP,
-            sub1.get_center() + 0.63*UP,
-            stroke_width=0.8
+        # Chain n_bits subtractors
+        stages, wires, labels = circuits.chain_mobjects(
+            self.n_bits, sub_symbol.copy(), formulas
         )
-        inputs = [r0, r0_line]
-        for sub in subs:
-            ai_line = mn.Line(
-                sub.get_center() + 0.42*LEFT + 0.05*UP,
-                sub.get_center() + LEFT + 0.05*UP,
-                stroke_width=0.8
-            )
-            ai = mn.TexMobject(f"A_{i}").scale(0.3).next_to(ai_line, LEFT)
-            inputs.append(mn.VGroup(ai_line, ai))
-
-            bi_line = mn.Line(
-                sub.get_center() + 0.42*LEFT + 0.265*DOWN,
-                sub.get_center() + LEFT + 0.265*DOWN,
-                stroke_width=0.8
-            )
-            bi = mn.TexMobject(f"B_{i}").scale(0.3).next_to(bi_line, LEFT)
-            inputs.append(mn.VGroup(bi_line, bi))
-
-        self.play(*[mn.ShowCreation(obj) for obj in inputs])
-
-        # Link outputs
-        outputs = []
-        for sub in subs:
-            si_line = mn.Line(
-                sub.get_center() + 0.42*RIGHT + 0.05*UP,
-                sub.get_center() + RIGHT + 0.05*UP,
-                stroke_width=0.8
-            )
-            si = mn.TexMobject(f"S_{i}").scale(0.3).next_to(si_line, RIGHT)
-            outputs.append(mn.VGroup(si_line, si))
-
-        self.play(*[mn.ShowCreation(obj) for obj in outputs])
-
-        complete_sub = mn.VGroup(*subs, *links, *inputs, *outputs)
-        self.play(mn.ApplyMethod(complete_sub.shift, 2*LEFT + 0.5*DOWN))
+        chain = mn.VGroup(stages, wires, labels)
+        chain.set_height(mn.FRAME_HEIGHT - 1).move_to(2 * LEFT)
+        first_stage = sub_symbol.copy().replace(stages[0])
+        self.play(mn.ReplacementTransform(sub_detailed, first_stage))
+        self.remove(first_stage)
+        self.add(stages)
+        self.play(mn.ShowCreation(wires), mn.ShowCreation(labels))
 
         # Draw a subtraction
         a = [
-            mn.TexMobject("5").move_to(subs[1].get_center() + 4*RIGHT),
-            mn.TexMobject("6").move_to(subs[1].get_center() + 4.5*RIGHT),
-            mn.TexMobject("3").move_to(subs[1].get_center() + 5*RIGHT),
-            mn.TexMobject("1").move_to(subs[1].get_center() + 5.5*RIGHT)
+            tex("5").move_to(stages[1].get_center() + 4*RIGHT),
+            tex("6").move_to(stages[1].get_center() + 4.5*RIGHT),
+            tex("3").move_to(stages[1].get_center() + 5*RIGHT),
+            tex("1").move_to(stages[1].get_center() + 5.5*RIGHT)
         ]
         b = [
-            mn.TexMobject("3").move_to(subs[1].get_center() + 0.5*DOWN + 4*RIGHT),
-            mn.TexMobject("8").move_to(subs[1].get_center() + 0.5*DOWN + 4.5*RIGHT),
-            mn.TexMobject("4").move_to(subs[1].get_center() + 0.5*DOWN + 5*RIGHT),
-            mn.TexMobject("6").move_to(subs[1].get_center() + 0.5*DOWN + 5.5*RIGHT)
+            tex("3").move_to(stages[1].get_center() + 0.5*DOWN + 4*RIGHT),
+            tex("8").move_to(stages[1].get_center() + 0.5*DOWN + 4.5*RIGHT),
+            tex("4").move_to(stages[1].get_center() + 0.5*DOWN + 5*RIGHT),
+            tex("6").move_to(stages[1].get_center() + 0.5*DOWN + 5.5*RIGHT)
         ]
-        minus_sign = mn.TexMobject("-").next_to(b[0], LEFT)
+        minus_sign = tex("-").next_to(b[0], LEFT)
         separator = mn.Line(
             minus_sign.get_center() + 0.5*LEFT + 0.5*DOWN,
             b[-1].get_center() + 0.5*RIGHT + 0.5*DOWN
@@ -242,3 +242,95 @@ class Tikz(mn.Scene):
         subtraction = mn.VGroup(*a, *b, minus_sign, separator)
         self.play(mn.ShowCreation(subtraction))
         self.wait(5)
+
+
+class InstancedSubtractors(mn.Scene):
+    """
+    A ripple chain of n_bits subtractors, all of them instances of a single
+    symbol, see instancing.py.
+    """
+    CONFIG = {
+        'camera_class': InstancingCamera,
+        'n_bits': 32,
+        'n_columns': 8,
+    }
+
+    def construct(self):
+        formulas = tex_labels.LabelFactory(
+            label_class=tex_labels.MathLabelMobject,
+            svg_files=tex_pool.default_pool.svg_files,
+        )
+        symbol = TikzMobject(subtractor_source)
+        center = symbol.get_center()
+        labels = formulas.labels(['A_i', 'B_i', 'R_{i-1}', 'S_i', 'R_i'])
+        for label, offset in zip(labels, [
+                0.7 * LEFT + 0.2 * UP, 0.7 * LEFT + 0.9 * DOWN, 0.9 * UP,
+                0.7 * RIGHT + 0.2 * UP, 0.7 * RIGHT + 0.9 * DOWN]):
+            label.move_to(center + offset)
+        template = InstanceTemplate(mn.VGroup(symbol, *labels))
+
+        subs = template.instances(self.n_bits)
+        subs.arrange_in_grid(n_cols=self.n_columns, buff=0.5)
+        subs.set_width(mn.FRAME_WIDTH - 1)
+        self.add(subs)
+        self.wait()
+
+        # ripple the borrow through the chain
+        for sub in subs:
+            sub.set_instance_style(color=mn.YELLOW)
+            self.wait(0.1)
+            sub.reset_instance_style()
+        for i, sub in enumerate(subs):
+            sub.set_instance_style(opacity=0.3 if i % 2 else 1)
+        self.play(mn.ApplyMethod(subs.scale, 0.8))
+        self.wait()
+
+
+class SignalPropagation(mn.Scene):
+    """
+    Borrows rippling through a chain of n_bits subtractors, for the first few
+    of n_vectors random subtractions all evaluated at once, see logic.py.
+    """
+    CONFIG = {
+        'camera_class': InstancingCamera,
+        'n_bits': 8,
+        'n_vectors': 4096,
+        'shown_vectors': 4,
+        'seed': 0,
+    }
+
+    def construct(self):
+        formulas = tex_labels.LabelFactory(
+            label_class=tex_labels.MathLabelMobject,
+            svg_files=tex_pool.default_pool.svg_files,
+        )
+        stages, wires, labels = circuits.chain_mobjects(
+            self.n_bits, TikzMobject(subtractor_source), formulas
+        )
+        chain = mn.VGroup(stages, wires, labels)
+        chain.set_height(mn.FRAME_HEIGHT - 1).to_edge(LEFT)
+
+        # every test vector's timeline, in a handful of NumPy operations
+        network = logic.subtractor_network(self.n_bits)
+        random = np.random.RandomState(self.seed)
+        a = random.randint(0, 2 ** self.n_bits, self.n_vectors)
+        b = random.randint(0, 2 ** self.n_bits, self.n_vectors)
+        timeline = network.timeline(
+            logic.subtractor_inputs(network, a, b, self.n_bits)
+        )
+        names, point_counts = circuits.RippleChain(self.n_bits).wire_signals()
+        timeline = timeline[:, [network.wires[name] for name in names]]
+
+        signals = logic.SignalWires(
+            wires, point_counts, logic.vector_bits(timeline, 0)
+        )
+        self.add(stages, labels, signals)
+        operation = formulas.labels(
+            [f'{a[i]} - {b[i]}' for i in range(self.shown_vectors)]
+        )
+        for vector in range(self.shown_vectors):
+            operation[vector].to_edge(RIGHT)
+            signals.set_timeline(logic.vector_bits(timeline, vector))
+            self.add(operation[vector])
+            self.wait(len(timeline) * signals.step_duration + 1)
+            self.remove(operation[vector])
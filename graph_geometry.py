@@ -0,0 +1,198 @@
+"""
+Geometry of a graph laid out by graphviz, as contiguous NumPy arrays.
+
+graphviz hands its layout back as `pos` and `lp` attribute strings. They are
+parsed once, all at the same time, into a single (n, 3) buffer of scene
+points, so that computing the graph's bounds or rescaling it to fit manim's
+frame are single array operations however many edges the graph has.
+"""
+import numpy as np
+
+
+def parse_points(strings):
+    """
+    Parse 'x,y' strings into an (n, 2) array, with a single float conversion
+    for all of them. Empty strings give NaN points.
+    """
+    strings = [s or 'nan,nan' for s in strings]
+    if not strings:
+        return np.zeros((0, 2))
+    return np.array(
+        ' '.join(strings).replace(',', ' ').split(), dtype=float
+    ).reshape(-1, 2)
+
+
+class GraphGeometry:
+    """
+    Node and edge geometry of a graph laid out by graphviz, detached from
+    pygraphviz so that it can be stored on disk.
+
+    All the coordinates live in the `points` buffer, in this order: node
+    centers, edge label anchors, edge arrowhead endpoints, then every edge's
+    spline control points, the ones of the i-th edge being
+    spline_points[edge_offsets[i]:edge_offsets[i + 1]]. Missing label
+    anchors and arrowhead endpoints are NaN.
+    """
+    METADATA = (
+        'node_names', 'node_labels', 'node_shapes', 'node_colors',
+        'edge_tails', 'edge_heads', 'edge_labels', 'edge_colors',
+    )
+
+    def __init__(self, points, edge_offsets, **metadata):
+        self.points = points
+        self.edge_offsets = edge_offsets
+        for name in self.METADATA:
+            setattr(self, name, metadata[name])
+
+    @property
+    def n_nodes(self):
+        return len(self.node_names)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_labels)
+
+    @property
+    def node_centers(self):
+        return self.points[:self.n_nodes]
+
+    @property
+    def label_anchors(self):
+        start = self.n_nodes
+        return self.points[start:start + self.n_edges]
+
+    @property
+    def edge_tips(self):
+        start = self.n_nodes + self.n_edges
+        return self.points[start:start + self.n_edges]
+
+    @property
+    def spline_points(self):
+        return self.points[self.n_nodes + 2 * self.n_edges:]
+
+    def edge_spline(self, i):
+        start, end = self.edge_offsets[i:i + 2]
+        return self.spline_points[start:end]
+
+    def bezier_points(self):
+        """
+        Return the control points of every edge as manim expects them, four
+        points per cubic Bezier curve, in a single (n, 3) array, along with
+        per-edge offsets into it.
+
+        graphviz splines are made of 3k + 1 points, each curve sharing its
+        last anchor with the next curve's first anchor.
+        """
+        n_curves = np.maximum(np.diff(self.edge_offsets) - 1, 0) // 3
+        curve_offsets = np.concatenate([[0], np.cumsum(n_curves)])
+        edge_of_curve = np.repeat(np.arange(self.n_edges), n_curves)
+        curve_in_edge = np.arange(curve_offsets[-1]) \
+            - curve_offsets[edge_of_curve]
+        first_points = self.edge_offsets[edge_of_curve] + 3 * curve_in_edge
+        indices = first_points[:, np.newaxis] + np.arange(4)
+        return (
+            self.spline_points[indices].reshape(-1, 3),
+            4 * curve_offsets,
+        )
+
+    def arrays(self):
+        arrays = {name: getattr(self, name) for name in self.METADATA}
+        arrays['points'] = self.points
+        arrays['edge_offsets'] = self.edge_offsets
+        return arrays
+
+    @classmethod
+    def from_agraph(cls, graph):
+        """
+        Read the layout computed by graphviz from the attributes of a laid out
+        pygraphviz graph.
+        """
+        nodes = list(graph.iternodes())
+        node_labels = []
+        for node in nodes:
+            # graphviz' default label is the node name
+            label = node.attr.get('label') or '\\N'
+            node_labels.append(label.replace('\\N', node.name))
+
+        edges = list(graph.edges())
+        edge_labels = [e.attr.get('label') or '' for e in edges]
+        label_anchors = [
+            (e.attr.get('lp') or '') if label else ''
+            for e, label in zip(edges, edge_labels)
+        ]
+
+        # edge.attr['pos'] contains a list of spline control points of the
+        # form: 'e,x1,y1 x2,y2 x3,y3 x4,y4 […]', optionally also starting
+        # with an 's,x,y' point for arrows at the tail
+        tips = []
+        splines = []
+        spline_lengths = []
+        for edge in edges:
+            tokens = edge.attr['pos'].split()
+            tip = ''
+            while tokens and tokens[0][:2] in ('e,', 's,'):
+                token = tokens.pop(0)
+                if token.startswith('e,'):
+                    tip = token[2:]
+            tips.append(tip)
+            splines.append(' '.join(tokens))
+            spline_lengths.append(len(tokens))
+
+        points = np.concatenate([
+            parse_points([n.attr['pos'] for n in nodes]),
+            parse_points(label_anchors),
+            parse_points(tips),
+            parse_points([s for s in splines if s]),
+        ])
+        points = np.hstack([points, np.zeros((len(points), 1))])
+
+        return cls(
+            points=points,
+            edge_offsets=np.concatenate([[0], np.cumsum(spline_lengths)])
+            .astype(np.int64),
+            node_names=np.array([n.name for n in nodes], dtype=str),
+            node_labels=np.array(node_labels, dtype=str),
+            node_shapes=np.array(
+                [n.attr.get('shape') or '' for n in nodes], dtype=str
+            ),
+            node_colors=np.array(
+                [n.attr.get('fillcolor') or '' for n in nodes], dtype=str
+            ),
+            edge_tails=np.array([e[0] for e in edges], dtype=str),
+            edge_heads=np.array([e[1] for e in edges], dtype=str),
+            edge_labels=np.array(edge_labels, dtype=str),
+            edge_colors=np.array(
+                [e.attr.get('color') or '' for e in edges], dtype=str
+            ),
+        )
+
+    def save(self, file):
+        np.savez(file, **self.arrays())
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as archive:
+            return cls(
+                archive['points'],
+                archive['edge_offsets'],
+                **{name: archive[name] for name in cls.METADATA}
+            )
+
+    def bounds(self):
+        """
+        Return the lower left and upper right corners of the bounding box of
+        all the points of the graph.
+        """
+        points = self.points[~np.isnan(self.points[:, 0])]
+        return points.min(axis=0), points.max(axis=0)
+
+    def scaled(self, ratio, shift=0):
+        """
+        Return a copy of this geometry with all of its points scaled by ratio
+        then shifted by shift.
+        """
+        return GraphGeometry(
+            self.points * ratio + shift,
+            self.edge_offsets,
+            **{name: getattr(self, name) for name in self.METADATA}
+        )
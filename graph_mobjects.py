@@ -0,0 +1,598 @@
+"""
+DOT graphs as manim mobjects: laying them out, rendering them and animating
+progressions of them.
+
+Progression steps are built in worker processes, which import this module to
+run its functions and to unpickle the mobjects they return: it must stay
+importable, unlike scene files, which manim loads without registering them
+as modules.
+"""
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import manimlib.constants as consts
+import manimlib.imports as mn
+import numpy as np
+import pygraphviz as pgv
+from pylatex.utils import escape_latex
+
+import diagnostics
+import layout_cache
+import tex_format
+import tex_labels
+from instancing import vmobject_style
+
+# compile every label and formula from precompiled preambles
+tex_format.install()
+
+
+class Node(mn.Circle):
+    CONFIG = {
+        'radius': 0.3,
+    }
+
+
+class EdgeTip(mn.ArrowTip):
+    """
+    Arrowhead of a graph edge, going from the end of the edge's spline to the
+    arrowhead endpoint computed by graphviz.
+    """
+    def __init__(self, base, tip, **kwargs):
+        vector = tip - base
+        mn.ArrowTip.__init__(self, length=mn.get_norm(vector), **kwargs)
+        self.rotate(mn.angle_of_vector(vector) - self.get_angle())
+        self.shift(tip - self.get_tip_point())
+
+
+class GraphArrow(mn.Arrow):
+    CONFIG = {
+        #  'stroke_width': 3,
+        #  'tip_length': 0.4,
+        #  "max_tip_length_to_length_ratio": 0.2,
+    }
+
+
+dot_to_manim_colors = {
+    'white': mn.WHITE,
+    'DimGray': mn.LIGHT_COLOR,
+    '': mn.WHITE,
+    'lightgray': mn.LIGHT_COLOR,
+}
+
+
+def scale_ratio_and_shift(*geometries):
+    """
+    Compute the ratio and shift by wich we need to rescale and move the graph's
+    graphviz positions so that it fits in manim's scene.
+
+    Given several graphs, e.g. the steps of a progression, compute a single
+    ratio and shift fitting all of them.
+    """
+    # consider nodes, spline control points, arrowheads and labels' positions
+    bounds = np.array([geometry.bounds() for geometry in geometries])
+    min_x, min_y, _ = bounds[:, 0].min(axis=0)
+    max_x, max_y, _ = bounds[:, 1].max(axis=0)
+
+    width = max_x - min_x
+    height = max_y - min_y
+
+    ratio = min(mn.FRAME_WIDTH / width, mn.FRAME_HEIGHT / height)
+    # last adjustment: the previous ration only allows for each node's *center*
+    # to be in screen, so we need to factor in the manim's rendered circle
+    # radius and stroke width
+    ratio *= mn.FRAME_WIDTH \
+        / (mn.FRAME_WIDTH
+            + 2 * Node.CONFIG['radius']
+            + mn.Circle().stroke_width / 2)
+
+    center = np.array([
+        (max_x + min_x) * ratio / 2,
+        (max_y + min_y) * ratio / 2,
+        0
+    ])
+
+    return ratio, -center
+
+
+class Detail:
+    """
+    What geometry_to_vgroup draws of a graph: labels as 'tex', as cheap
+    'placeholder' bars or 'none' at all, edges as splines or as polylines
+    through their anchors, parallel edges each or bundled into one, and
+    nodes and labels scaled by node_scale.
+    """
+    def __init__(self, labels='tex', polylines=False, bundle=False,
+                 node_scale=1):
+        self.labels = labels
+        self.polylines = polylines
+        self.bundle = bundle
+        self.node_scale = node_scale
+
+    def key(self):
+        return (self.labels, self.polylines, self.bundle, self.node_scale)
+
+    def __eq__(self, other):
+        return isinstance(other, Detail) and self.key() == other.key()
+
+
+# scene units per graphviz point at which our circles have the size graphviz
+# laid out our 0.4in wide nodes with
+NODE_RATIO = 2 * Node.CONFIG['radius'] / (0.4 * 72)
+
+
+def level_of_detail(ratio, label_zoom=0.6, placeholder_zoom=0.3):
+    """
+    Return the Detail to draw a graph scaled into the scene by ratio with.
+
+    Graphs small enough to fit the scene at NODE_RATIO or more are drawn in
+    full. Others have their nodes and labels shrunk to fit their layout,
+    down to label_zoom times their size, under which labels become
+    placeholders, edges polylines and parallel edges get bundled, and under
+    placeholder_zoom labels aren't drawn at all.
+    """
+    zoom = ratio / NODE_RATIO
+    if zoom >= 1:
+        return Detail()
+    # quantized, so that a zooming camera only changes the level every now
+    # and then
+    node_scale = 2 ** (np.floor(2 * np.log2(zoom)) / 2)
+    if zoom >= label_zoom:
+        return Detail(node_scale=node_scale)
+    return Detail(
+        labels='placeholder' if zoom >= placeholder_zoom else 'none',
+        polylines=True,
+        bundle=True,
+        node_scale=node_scale,
+    )
+
+
+def graph_layout(source, prog='dot'):
+    """
+    Return the GraphGeometry of the graphviz layout of a DOT source, from the
+    layout cache if this source was already laid out.
+    """
+    # DEBUG: draw the layout in png files, see the diagnostics module
+    diagnostics.sink.graph(source, prog)
+
+    return layout_cache.default_cache.layout(source, prog)
+
+
+def seed_source(source, previous):
+    """
+    Return a copy of a DOT source to be laid out with neato, where the nodes
+    that are unchanged since the `previous` GraphGeometry are pinned to their
+    previous position.
+    """
+    A = pgv.AGraph(source)
+    previous_nodes = {
+        name: (label, shape, pos)
+        for name, label, shape, pos in zip(
+            previous.node_names, previous.node_labels, previous.node_shapes,
+            previous.node_centers)
+    }
+    for node in A.iternodes():
+        label = (node.attr.get('label') or '\\N').replace('\\N', node.name)
+        shape = node.attr.get('shape') or ''
+        if node.name not in previous_nodes:
+            continue
+        previous_label, previous_shape, (x, y, _) = previous_nodes[node.name]
+        if (label, shape) != (previous_label, previous_shape):
+            continue
+        # input positions are in inches, graphviz' output ones in points
+        node.attr['pos'] = f'{x / 72},{y / 72}!'
+        node.attr['pin'] = 'true'
+    # keep graphviz from moving the whole layout back to the origin, which
+    # would offset the pinned nodes
+    A.graph_attr['notranslate'] = 'true'
+    A.graph_attr['splines'] = 'true'
+    return A.string()
+
+
+def incremental_layouts(sources, prog='dot', incremental_prog='neato'):
+    """
+    Lay out the steps of a progression list, the first one from scratch and
+    each following one seeded with the previous step's positions, so that
+    unchanged nodes stay in place and only new or modified nodes are laid
+    out.
+    """
+    geometries = []
+    for source in sources:
+        if geometries:
+            source = seed_source(source, geometries[-1])
+            geometries.append(graph_layout(source, incremental_prog))
+        else:
+            geometries.append(graph_layout(source, prog))
+    return geometries
+
+
+def graph_label_strings(geometry):
+    """
+    Return the LaTeX strings of the node labels and edge labels that
+    dot_to_vgroup renders for the given graph geometry.
+    """
+    # 'point' shaped nodes aren't real nodes, they often represent the
+    # origin of the arrow of an initial stat or the destination of the
+    # arrow of a final state
+    node_names = geometry.node_names[geometry.node_shapes != 'point']
+    edge_labels = geometry.edge_labels[geometry.edge_labels != '']
+    return (
+        [escape_latex(name) for name in node_names],
+        [escape_latex(label) for label in edge_labels],
+    )
+
+
+def compile_progression_labels(sources):
+    """
+    Compile the labels of all the given DOT sources in a single LaTeX run, so
+    that the following dot_to_vgroup calls don't run LaTeX at all.
+    """
+    strings = set()
+    for source in sources:
+        node_strings, edge_strings = graph_label_strings(graph_layout(source))
+        strings.update(node_strings, edge_strings)
+    tex_labels.label_files(sorted(strings))
+
+
+def dot_to_vgroup(source, packed=False):
+    """
+    Render a DOT source as a VGroup of one submobject per node and edge, see
+    geometry_to_vgroup, or as a PackedGraph if packed is set.
+    """
+    geometry = graph_layout(source)
+    ratio, shift = scale_ratio_and_shift(geometry)
+    # bring every graphviz position into manim's scene at once
+    vgroup = geometry_to_vgroup(
+        geometry.scaled(ratio, shift), level_of_detail(ratio)
+    )
+    return PackedGraph(vgroup) if packed else vgroup
+
+
+def label_placeholder(text, position, scale=1):
+    """
+    Return a bar roughly as wide as the label it stands for, without
+    running LaTeX.
+    """
+    half_width = 0.06 * scale * max(len(text), 1) * mn.RIGHT
+    return mn.Line(
+        position - half_width, position + half_width,
+        stroke_width=2, stroke_opacity=0.6,
+    )
+
+
+def geometry_to_vgroup(geometry, detail=None):
+    """
+    Render a GraphGeometry already scaled to manim's scene as a VGroup of one
+    submobject per node and edge, each tagged with a `dot_key` attribute: the
+    node's name, or the edge's (source, destination, label) triple, parallel
+    edges sharing the same triple being numbered. detail, a Detail, defaults
+    to full detail.
+    """
+    detail = detail or Detail()
+    scale = detail.node_scale
+
+    # Render all the labels of the graph in one go
+    node_strings, edge_strings = graph_label_strings(geometry)
+    if detail.labels == 'tex':
+        mlabels = iter(tex_labels.default_factory.labels(
+            node_strings + edge_strings,
+            scale=[scale] * len(node_strings)
+            + [0.65 * scale] * len(edge_strings),
+        ))
+
+    def label(text, position, label_scale):
+        if detail.labels == 'tex':
+            return next(mlabels).move_to(position)
+        if detail.labels == 'placeholder':
+            return label_placeholder(text, position, label_scale)
+        return None
+
+    # spawn each node in manim using the rescaled graphviz positions
+    mnodes = []
+    for name, shape, fillcolor, pos in zip(
+            geometry.node_names, geometry.node_shapes, geometry.node_colors,
+            geometry.node_centers):
+        if shape == 'point':
+            continue
+
+        # Try to translate graphviz color to manim, fallback to white
+        color = dot_to_manim_colors.get(fillcolor or 'white', mn.WHITE)
+
+        # Place the node's label and render its circle
+        mcircle = Node(
+            arc_center=pos, color=color,
+            radius=Node.CONFIG['radius'] * scale,
+        )
+        mlabel = label(name, pos, scale)
+        mnode = mn.VGroup(mcircle, *[mlabel] if mlabel else [])
+        mnode.dot_key = str(name)
+        mnodes.append(mnode)
+
+    # spawn each edges in a similar way, using graphviz' own Bezier curves
+    bezier_points, bezier_offsets = geometry.bezier_points()
+    medges = []
+    parallel_edges = Counter()
+    bundled = set()
+    for i, (tail, head, text, color, label_pos, tip) in enumerate(zip(
+            geometry.edge_tails, geometry.edge_heads, geometry.edge_labels,
+            geometry.edge_colors, geometry.label_anchors,
+            geometry.edge_tips)):
+        if detail.bundle:
+            # a single edge stands for all those between the same states
+            if (tail, head) in bundled:
+                continue
+            bundled.add((tail, head))
+        points = bezier_points[bezier_offsets[i]:bezier_offsets[i + 1]]
+
+        # Try to translate graphviz color to manim, fallback to white
+        color = dot_to_manim_colors.get(color or 'white', mn.WHITE)
+
+        # Render the edge's path, its arrowhead and place its label
+        mpath = mn.VMobject(color=color)
+        if detail.polylines and len(points):
+            mpath.set_points_as_corners(
+                np.concatenate([points[::4], points[-1:]])
+            )
+        else:
+            mpath.set_points(points)
+        if len(points) and not np.isnan(tip[0]) \
+                and not np.allclose(tip, points[-1]):
+            mpath.add(EdgeTip(points[-1], tip, color=color))
+        mlabel = label(text, label_pos, 0.65 * scale) if text else None
+        medge = mn.VGroup(mpath, mlabel) if mlabel else mpath
+        key = (str(tail), str(head), str(text))
+        medge.dot_key = key + (parallel_edges[key],) \
+            if parallel_edges[key] else key
+        parallel_edges[key] += 1
+        medges.append(medge)
+        if diagnostics.sink.enabled:
+            n_points = len(geometry.edge_spline(i))
+            diagnostics.sink.message(f'{medge.dot_key}: {n_points} points')
+    if diagnostics.sink.enabled:
+        factory = tex_labels.default_factory
+        diagnostics.sink.message(
+            f'labels: {factory.hits} hits, {factory.misses} misses'
+        )
+    return mn.VGroup(*mnodes, *medges)
+
+
+class LevelOfDetailGraph(mn.VGroup):
+    """
+    A graph re-rendered with more or less detail as a MovingCamera's frame
+    zooms in and out, geometry being scaled into the scene by ratio. The
+    graph is rebuilt from its geometry whenever the level changes, so it's
+    meant to stay where its geometry puts it.
+    """
+    def __init__(self, geometry, ratio, frame=None, **kwargs):
+        self.geometry = geometry
+        self.ratio = ratio
+        self.frame = frame
+        self.detail = None
+        mn.VGroup.__init__(self, **kwargs)
+        self.update_detail()
+        if frame is not None:
+            self.add_updater(lambda m: m.update_detail())
+
+    def effective_ratio(self):
+        if self.frame is None:
+            return self.ratio
+        return self.ratio * mn.FRAME_WIDTH / self.frame.get_width()
+
+    def update_detail(self):
+        detail = level_of_detail(self.effective_ratio())
+        if detail != self.detail:
+            self.detail = detail
+            self.submobjects = list(geometry_to_vgroup(self.geometry, detail))
+        return self
+
+
+class PackedGraph(mn.VGroup):
+    """
+    A graph as rendered by geometry_to_vgroup, with all the paths sharing the
+    same style merged into a single multi-subpath VMobject: typically one
+    for the circles and edges of each colour, one for the arrowheads and one
+    for all the label glyphs. Drawing it is then a handful of cairo calls
+    however large the graph is.
+
+    `slices` maps the dot_key of each node and edge to the (part, start, end)
+    ranges of its points in the parts, from which element() rebuilds
+    standalone copies, e.g. to highlight them. Packed graphs don't go
+    through progression_transition, which needs one submobject per element.
+    """
+    def __init__(self, vgroup, **kwargs):
+        styles = {}
+        points = []
+        lengths = []
+        self.slices = {}
+        for element in vgroup:
+            ranges = self.slices.setdefault(element.dot_key, [])
+            for member in element.family_members_with_points():
+                style = vmobject_style(member)
+                if style not in styles:
+                    styles[style] = (len(styles), member)
+                    points.append([])
+                    lengths.append(0)
+                part = styles[style][0]
+                ranges.append(
+                    (part, lengths[part], lengths[part] + len(member.points))
+                )
+                points[part].append(member.points)
+                lengths[part] += len(member.points)
+
+        # parts are kept in order of first appearance, which preserves the
+        # drawing order of the elements of the graph for the most part
+        parts = [
+            mn.VMobject().set_points(np.concatenate(part_points))
+            .match_style(member)
+            for (_, member), part_points in zip(styles.values(), points)
+        ]
+        mn.VGroup.__init__(self, *parts, **kwargs)
+
+    def element(self, dot_key):
+        """
+        Return a copy of the node or edge with the given dot_key, as a VGroup
+        of one VMobject per part it has points in.
+        """
+        return mn.VGroup(*[
+            mn.VMobject().set_points(self[part].points[start:end])
+            .match_style(self[part])
+            for part, start, end in self.slices[dot_key]
+        ])
+
+    def highlight(self, dot_key, color=mn.YELLOW):
+        """
+        Return a copy of the given element in the given colour, to be added
+        over the packed graph.
+        """
+        return self.element(dot_key).set_color(color)
+
+
+def same_mobject(mobject1, mobject2):
+    """
+    Tell whether two mobjects would render the same.
+    """
+    family1 = mobject1.family_members_with_points()
+    family2 = mobject2.family_members_with_points()
+    if len(family1) != len(family2):
+        return False
+    for m1, m2 in zip(family1, family2):
+        if m1.points.shape != m2.points.shape \
+                or not np.allclose(m1.points, m2.points):
+            return False
+        for rgbas1, rgbas2 in [
+                (m1.get_fill_rgbas(), m2.get_fill_rgbas()),
+                (m1.get_stroke_rgbas(), m2.get_stroke_rgbas())]:
+            if rgbas1.shape != rgbas2.shape \
+                    or not np.allclose(rgbas1, rgbas2):
+                return False
+        if m1.get_stroke_width() != m2.get_stroke_width():
+            return False
+    return True
+
+
+def diff_vgroups(old, new):
+    """
+    Match the elements of two dot_to_vgroup results by their DOT keys, and
+    return the (old, new) pairs that changed along with the old elements that
+    were removed and the new elements that were added.
+    """
+    old_parts = {m.dot_key: m for m in old.submobjects}
+    new_parts = {m.dot_key: m for m in new.submobjects}
+    # in the order of old, so that the animations are the same on every run
+    changed = [
+        (m_old, new_parts[key]) for key, m_old in old_parts.items()
+        if key in new_parts and not same_mobject(m_old, new_parts[key])
+    ]
+    removed = [m for key, m in old_parts.items() if key not in new_parts]
+    added = [m for key, m in new_parts.items() if key not in old_parts]
+    return changed, removed, added
+
+
+def progression_transition(old, new, **kwargs):
+    """
+    Animate the transition between two steps of a progression, only touching
+    what changed: elements that moved or changed are transformed, removed
+    ones fade out and added ones fade in, the others are left as they are.
+
+    Returns None if nothing changed. Once played, the scene should swap `old`
+    for `new`.
+    """
+    changed, removed, added = diff_vgroups(old, new)
+    animations = [
+        *[mn.Transform(m_old, m_new) for m_old, m_new in changed],
+        *[mn.FadeOut(m) for m in removed],
+        *[mn.FadeIn(m) for m in added],
+    ]
+    if not animations:
+        return None
+    return mn.AnimationGroup(*animations, **kwargs)
+
+
+
+def play_progression(scene, steps, **kwargs):
+    """
+    Play the steps of a progression, e.g. as yielded by iter_progression, in
+    the scene: draw the first one, then animate each transition with
+    progression_transition and swap the steps, waiting after each of them.
+    Returns the last step, left in the scene.
+    """
+    current = next(steps)
+    scene.play(mn.ShowCreation(current))
+    scene.wait()
+    for step in steps:
+        transition = progression_transition(current, step, **kwargs)
+        if transition is not None:
+            scene.play(transition)
+        # FadeOut removes its element from the scene once done, which splits
+        # the step into its other elements at the scene's top level, and
+        # FadeIn adds its element there: take both steps out element-wise
+        scene.remove(*current.get_family(), *step.get_family())
+        scene.add(step)
+        scene.wait()
+        current = step
+    return current
+
+def init_progression_worker(media_dir, tex_dir):
+    # workers may not have gone through manim's directories initialization
+    consts.MEDIA_DIR = media_dir
+    consts.TEX_DIR = tex_dir
+
+
+def progression_executor(processes=None):
+    return ProcessPoolExecutor(
+        processes,
+        initializer=init_progression_worker,
+        initargs=(consts.MEDIA_DIR, consts.TEX_DIR),
+    )
+
+
+def progression_to_vgroups(sources, processes=None):
+    """
+    Lay out and build every step of a progression list concurrently in a
+    process pool, and return their VGroups in order.
+    """
+    with progression_executor(processes) as executor:
+        # lay out all the steps at once, workers store them in the layout
+        # cache
+        list(executor.map(graph_layout, sources))
+        # a single LaTeX run for all the labels of the progression, so that
+        # workers don't compile the same labels concurrently
+        compile_progression_labels(sources)
+        return list(executor.map(dot_to_vgroup, sources))
+
+
+def iter_progression(sources, lookahead=1, processes=None,
+                     incremental=False):
+    """
+    Yield the VGroup of each step of a progression list in order, building
+    the next `lookahead` steps in background processes while the caller
+    animates the current one.
+
+    At most lookahead + 1 steps are built ahead of the caller, so memory stays
+    flat on long progressions.
+
+    In incremental mode, the steps are laid out with incremental_layouts and
+    all share the same scaling, so that unchanged nodes don't move at all
+    between steps.
+    """
+    if incremental:
+        geometries = incremental_layouts(sources)
+        ratio, shift = scale_ratio_and_shift(*geometries)
+        detail = level_of_detail(ratio)
+        jobs = (
+            (geometry_to_vgroup, geometry.scaled(ratio, shift), detail)
+            for geometry in geometries
+        )
+    else:
+        jobs = ((dot_to_vgroup, source) for source in sources)
+
+    with progression_executor(processes or lookahead + 1) as executor:
+        pending = deque(
+            executor.submit(*job) for job in islice(jobs, lookahead + 1)
+        )
+        while pending:
+            vgroup = pending.popleft().result()
+            # keep the pipeline full before handing the step over
+            for job in islice(jobs, 1):
+                pending.append(executor.submit(*job))
+            yield vgroup
@@ -0,0 +1,217 @@
+"""
+Flyweight instancing of vectorized mobjects.
+
+Copying a mobject N times copies all of its points N times, and every
+animation then updates all of them on every frame. An Instance rather keeps
+a reference to a shared InstanceTemplate, holding the template's points once,
+and only has four points of its own: the corners of the template's bounding
+box. Manim's affine operations (shift, scale, rotate, move_to, next_to...)
+move those corners, from which the instance's transform is recovered at
+render time.
+
+Instances are only drawn by an InstancingCamera, which builds the template's
+cairo paths once and draws each of them for all the instances in a single
+fill or stroke, under their own transforms.
+"""
+import cairo
+import manimlib.imports as mn
+import numpy as np
+from manimlib.utils.iterables import batch_by_property
+
+
+def vmobject_style(vmobject):
+    """
+    Return the fill rgba, background stroke rgba and width, and stroke rgba
+    and width of a VMobject, gradients being reduced to their first colour,
+    as a hashable tuple.
+    """
+    return (
+        tuple(vmobject.get_fill_rgbas()[0]),
+        tuple(vmobject.get_stroke_rgbas(background=True)[0]),
+        vmobject.get_stroke_width(background=True),
+        tuple(vmobject.get_stroke_rgbas()[0]),
+        vmobject.get_stroke_width(),
+    )
+
+
+class InstanceTemplate:
+    """
+    Geometry and style shared by instances of a VMobject. The points of all
+    of its family members live in one `points` buffer; consecutive members
+    drawn with the same style are merged into runs, each drawn as one path.
+    """
+    def __init__(self, vmobject):
+        vmobject = vmobject.copy()
+        members = vmobject.family_members_with_points()
+        self.points = np.concatenate([m.points for m in members])
+        offsets = np.cumsum([0] + [len(m.points) for m in members])
+        for member, start, end in zip(members, offsets, offsets[1:]):
+            member.points = self.points[start:end]
+
+        # list of (style, [(subpath, closed)...]) runs
+        self.runs = []
+        for member in members:
+            style = vmobject_style(member)
+            subpaths = [
+                (subpath, member.consider_points_equals(
+                    subpath[0], subpath[-1]
+                ))
+                for subpath in member.get_subpaths()
+            ]
+            if self.runs and self.runs[-1][0] == style:
+                self.runs[-1][1].extend(subpaths)
+            else:
+                self.runs.append((style, subpaths))
+
+        # corners of the bounding box in the order Instance stores them
+        self.corners = np.array([
+            vmobject.get_corner(mn.DL), vmobject.get_corner(mn.DR),
+            vmobject.get_corner(mn.UL), vmobject.get_corner(mn.UR),
+        ])
+
+    def instance(self, **kwargs):
+        return Instance(self, **kwargs)
+
+    def instances(self, n, **kwargs):
+        return mn.VGroup(*[self.instance(**kwargs) for _ in range(n)])
+
+
+class Instance(mn.VMobject):
+    """
+    One placement of an InstanceTemplate, with optional colour and opacity
+    overrides applying to all of its paths.
+
+    Its points are the template's bounding box corners, which is all that
+    manim's layout methods and affine transforms need. Animations that don't
+    move points affinely, such as ShowCreation, have no meaningful effect on
+    instances.
+    """
+    CONFIG = {
+        # the corners aren't meant to be seen, on any camera
+        'stroke_width': 0,
+        'fill_opacity': 0,
+    }
+
+    def __init__(self, template, **kwargs):
+        self.template = template
+        self.instance_color = None
+        self.instance_opacity = 1
+        mn.VMobject.__init__(self, **kwargs)
+
+    def generate_points(self):
+        self.set_points(self.template.corners.copy())
+
+    def set_instance_style(self, color=None, opacity=None):
+        """
+        Draw this instance in the given colour instead of the template's
+        colours, and/or with its opacities scaled by opacity.
+        """
+        if color is not None:
+            self.instance_color = tuple(mn.color_to_rgb(color))
+        if opacity is not None:
+            self.instance_opacity = opacity
+        return self
+
+    def reset_instance_style(self):
+        self.instance_color = None
+        self.instance_opacity = 1
+        return self
+
+    def get_cairo_matrix(self):
+        """
+        Return the cairo matrix mapping the template's coordinates to this
+        instance's coordinates in the scene.
+        """
+        c0, c1, c2 = self.template.corners[:3]
+        p0, p1, p2 = self.points[:3]
+        u = (p1 - p0) / max(c1[0] - c0[0], 1e-8)
+        v = (p2 - p0) / max(c2[1] - c0[1], 1e-8)
+        return cairo.Matrix(
+            u[0], u[1], v[0], v[1],
+            p0[0] - u[0] * c0[0] - v[0] * c0[1],
+            p0[1] - u[1] * c0[0] - v[1] * c0[1],
+        )
+
+
+class InstancingCamera(mn.Camera):
+    """
+    Camera drawing Instance mobjects, see the module's documentation.
+    Consecutive instances of the same template are drawn together.
+    """
+    def __init__(self, *args, **kwargs):
+        mn.Camera.__init__(self, *args, **kwargs)
+        # template id -> (template, one cairo path per run)
+        self.template_paths = {}
+
+    def display_multiple_non_background_colored_vmobjects(
+            self, vmobjects, pixel_array):
+        ctx = self.get_cairo_context(pixel_array)
+        batches = batch_by_property(
+            vmobjects,
+            lambda vm: vm.template if isinstance(vm, Instance) else None
+        )
+        for batch, template in batches:
+            if template is None:
+                for vmobject in batch:
+                    self.display_vectorized(vmobject, ctx)
+            else:
+                self.display_instances(template, batch, ctx)
+
+    def get_template_paths(self, template, ctx):
+        if id(template) not in self.template_paths:
+            ctx.save()
+            ctx.identity_matrix()
+            paths = []
+            for style, subpaths in template.runs:
+                ctx.new_path()
+                for subpath, closed in subpaths:
+                    ctx.new_sub_path()
+                    ctx.move_to(*subpath[0][:2])
+                    for p0, p1, p2, p3 in subpath.reshape(-1, 4, 3):
+                        ctx.curve_to(*p1[:2], *p2[:2], *p3[:2])
+                    if closed:
+                        ctx.close_path()
+                paths.append(ctx.copy_path())
+            ctx.restore()
+            ctx.new_path()
+            self.template_paths[id(template)] = (template, paths)
+        return self.template_paths[id(template)][1]
+
+    def display_instances(self, template, instances, ctx):
+        paths = self.get_template_paths(template, ctx)
+        overrides = batch_by_property(
+            instances, lambda i: (i.instance_color, i.instance_opacity)
+        )
+        for batch, (color, opacity) in overrides:
+            matrices = [instance.get_cairo_matrix() for instance in batch]
+            for (style, _), path in zip(template.runs, paths):
+                ctx.new_path()
+                for matrix in matrices:
+                    ctx.save()
+                    ctx.transform(matrix)
+                    ctx.append_path(path)
+                    ctx.restore()
+                # strokes are drawn under the scene's own transform, so that
+                # their width doesn't depend on the instance's scale, as for
+                # any other mobject
+                fill, background, background_width, stroke, width = style
+                self.apply_instance_paint(
+                    ctx, background, color, opacity, background_width
+                )
+                self.apply_instance_paint(ctx, fill, color, opacity)
+                self.apply_instance_paint(ctx, stroke, color, opacity, width)
+
+    def apply_instance_paint(self, ctx, rgba, color, opacity, width=None):
+        if width == 0 or rgba[3] * opacity == 0:
+            return
+        rgb = rgba[:3] if color is None else color
+        # cairo surfaces store colours in reverse order
+        ctx.set_source_rgba(*rgb[::-1], rgba[3] * opacity)
+        if width is None:
+            ctx.fill_preserve()
+        else:
+            ctx.set_line_width(
+                width * self.cairo_line_width_multiple
+                * (self.get_frame_width() / mn.FRAME_WIDTH)
+            )
+            ctx.stroke_preserve()
@@ -0,0 +1,178 @@
+"""
+Persistent, content-addressed cache of graphviz layouts.
+
+Running graphviz is the slowest part of turning a DOT source into manim
+objects, and our scenes keep laying out the very same sources. Layouts are
+keyed by a hash of the DOT source, the layout program and the graphviz
+version, and stored as uncompressed .npz archives holding only what
+dot_to_vgroup needs: node positions, edge spline points and label positions,
+see GraphGeometry.
+"""
+import hashlib
+import os
+import subprocess
+from functools import lru_cache
+
+import manimlib.constants as consts
+import pygraphviz as pgv
+
+from graph_geometry import GraphGeometry
+
+
+@lru_cache(maxsize=None)
+def graphviz_version(prog='dot'):
+    """
+    Return the version banner of the given graphviz program, e.g.
+    'dot - graphviz version 2.43.0 (0)'.
+    """
+    # graphviz prints its version on stderr
+    result = subprocess.run(
+        [prog, '-V'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    return result.stdout.strip()
+
+
+class LayoutCache:
+    """
+    On-disk cache of graph layouts as GraphGeometry objects, bounded to
+    max_bytes by evicting the least recently used entries. The whole cache is
+    dropped whenever the graphviz version it was filled with changes.
+    """
+    VERSION_FILE = 'graphviz_version'
+
+    def __init__(self, directory=None, max_bytes=64 * 2**20):
+        self._directory = directory
+        self.max_bytes = max_bytes
+        self._checked_versions = set()
+
+    @property
+    def directory(self):
+        # resolved lazily, manim only sets up its media directory after our
+        # scene modules are imported
+        if self._directory is None:
+            self._directory = os.path.join(
+                consts.MEDIA_DIR or './media', 'graphviz_layouts'
+            )
+        os.makedirs(self._directory, exist_ok=True)
+        return self._directory
+
+    def key(self, source, prog='dot'):
+        hasher = hashlib.sha256()
+        for part in (graphviz_version(prog), prog, source):
+            hasher.update(part.encode())
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def path(self, source, prog='dot'):
+        return os.path.join(
+            self.directory, self.key(source, prog) + '.npz'
+        )
+
+    def check_version(self, prog='dot'):
+        """
+        Invalidate the whole cache if it was filled by another graphviz
+        version than the installed one.
+        """
+        if prog in self._checked_versions:
+            return
+        # a single stamp for all of graphviz' programs, without the program's
+        # name in front of the version, so that checking another program
+        # doesn't wipe the layouts of the first one
+        version = graphviz_version(prog).split(' - ', 1)[-1]
+        stamp = os.path.join(self.directory, self.VERSION_FILE)
+        try:
+            with open(stamp) as f:
+                previous = f.read()
+        except FileNotFoundError:
+            previous = None
+        if previous != version:
+            # keys include the version, a fresh cache has nothing stale and
+            # concurrent renders may already be filling it
+            if previous is not None:
+                self.clear()
+            tmp_stamp = f'{stamp}.{os.getpid()}.tmp'
+            with open(tmp_stamp, 'w') as f:
+                f.write(version)
+            os.replace(tmp_stamp, stamp)
+        self._checked_versions.add(prog)
+
+    def get(self, source, prog='dot'):
+        """
+        Return the cached layout of the given DOT source, or None.
+        """
+        self.check_version(prog)
+        path = self.path(source, prog)
+        try:
+            layout = GraphGeometry.load(path)
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            return None
+        # keep track of recently used entries for eviction, unless another
+        # process evicted this one since it was loaded
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return layout
+
+    def put(self, source, graph, prog='dot'):
+        """
+        Store the layout of the laid out pygraphviz graph `graph` built from
+        `source`, and return it.
+        """
+        self.check_version(prog)
+        layout = GraphGeometry.from_agraph(graph)
+        path = self.path(source, prog)
+        # write then rename so that concurrent renders never read a partially
+        # written entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            layout.save(f)
+        os.replace(tmp_path, path)
+        self.evict()
+        return layout
+
+    def layout(self, source, prog='dot'):
+        """
+        Return the layout of the given DOT source, running graphviz only if it
+        isn't cached yet.
+        """
+        layout = self.get(source, prog)
+        if layout is None:
+            graph = pgv.AGraph(source)
+            graph.layout(prog=prog)
+            layout = self.put(source, graph, prog)
+        return layout
+
+    def entries(self):
+        with os.scandir(self.directory) as it:
+            return [
+                entry for entry in it
+                if entry.is_file() and entry.name.endswith('.npz')
+            ]
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        max_bytes.
+        """
+        entries = [(e.stat(), e.path) for e in self.entries()]
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda e: e[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+
+    def clear(self):
+        for entry in self.entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+default_cache = LayoutCache()
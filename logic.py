@@ -0,0 +1,249 @@
+"""
+Bit-parallel evaluation of logic networks, to drive signal propagation
+animations.
+
+Signals are packed 64 test vectors per uint64 word, so that every gate
+evaluates thousands of input vectors with a single NumPy bitwise operation.
+Besides the settled outputs, a network computes unit-delay timelines: the
+value of every wire after each gate delay, all the gates of a kind being
+evaluated at once per step.
+"""
+import manimlib.imports as mn
+import numpy as np
+
+
+WORD_BITS = 64
+
+
+def pack_bits(values, n_bits):
+    """
+    Pack the n_bits low bits of each of the given integers into a
+    (n_bits, n_words) array of words, bit k of word w of row i being bit i of
+    values[64 * w + k].
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    n_words = -(-len(values) // WORD_BITS)
+    bits = (values >> np.arange(n_bits, dtype=np.uint64)[:, np.newaxis]) \
+        & np.uint64(1)
+    bits = np.pad(bits, [(0, 0), (0, n_words * WORD_BITS - len(values))])
+    shifts = np.arange(WORD_BITS, dtype=np.uint64)
+    return (
+        bits.reshape(n_bits, n_words, WORD_BITS) << shifts
+    ).sum(axis=2, dtype=np.uint64)
+
+
+def unpack_bits(words, n_vectors):
+    """
+    Inverse of pack_bits for any number of leading axes: return booleans of
+    shape words.shape[:-1] + (n_vectors,).
+    """
+    shifts = np.arange(WORD_BITS, dtype=np.uint64)
+    bits = (words[..., np.newaxis] >> shifts) & np.uint64(1)
+    return bits.reshape(words.shape[:-1] + (-1,))[..., :n_vectors] \
+        .astype(bool)
+
+
+def vector_bits(words, vector):
+    """
+    Return the bits of the given test vector out of packed words, e.g. its
+    (steps, n_wires) timeline out of a packed timeline.
+    """
+    word, bit = divmod(vector, WORD_BITS)
+    return ((words[..., word] >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+
+
+class LogicNetwork:
+    """
+    Network of two-input xor, and and or gates and of not gates, over named
+    wires. Gates must be added in topological order.
+    """
+    OPERATIONS = {
+        'xor': np.bitwise_xor,
+        'and': np.bitwise_and,
+        'or': np.bitwise_or,
+        'not': lambda a, _: np.invert(a),
+    }
+
+    def __init__(self):
+        self.wires = {}
+        self.inputs = []
+        self.gates = []
+
+    def wire(self, name):
+        if name not in self.wires:
+            self.wires[name] = len(self.wires)
+        return self.wires[name]
+
+    def input(self, name):
+        self.inputs.append(self.wire(name))
+        return self.wires[name]
+
+    def gate(self, operation, output, *inputs):
+        indices = [self.wire(name) for name in inputs]
+        # not gates just ignore their second input
+        indices += indices[-1:] * (2 - len(indices))
+        self.gates.append((operation, self.wire(output), *indices))
+        return self.wires[output]
+
+    @property
+    def n_wires(self):
+        return len(self.wires)
+
+    def gate_arrays(self):
+        """
+        Return, per operation, the arrays of output and input wire indices of
+        all the gates doing it.
+        """
+        by_operation = {}
+        for operation, output, in1, in2 in self.gates:
+            by_operation.setdefault(operation, []).append((output, in1, in2))
+        return {
+            operation: np.array(gates).T
+            for operation, gates in by_operation.items()
+        }
+
+    def depth(self):
+        """
+        Return the number of gate delays after which every wire is settled.
+        """
+        levels = np.zeros(self.n_wires, dtype=int)
+        for _, output, in1, in2 in self.gates:
+            levels[output] = max(levels[in1], levels[in2]) + 1
+        return int(levels.max(initial=0))
+
+    def initial_values(self, inputs):
+        """
+        Return the (n_wires, n_words) values with the given inputs, a mapping
+        of input names to packed words, and every other wire low.
+        """
+        n_words = len(next(iter(inputs.values())))
+        values = np.zeros((self.n_wires, n_words), dtype=np.uint64)
+        for name, words in inputs.items():
+            values[self.wires[name]] = words
+        return values
+
+    def evaluate(self, inputs):
+        """
+        Return the settled (n_wires, n_words) values of all the wires for the
+        given packed inputs.
+        """
+        values = self.initial_values(inputs)
+        for operation, output, in1, in2 in self.gates:
+            values[output] = self.OPERATIONS[operation](
+                values[in1], values[in2]
+            )
+        return values
+
+    def timeline(self, inputs, steps=None, initial=None):
+        """
+        Return the (steps + 1, n_wires, n_words) values of all the wires
+        after each gate delay, starting from initial values (every non input
+        wire low by default) when the given packed inputs are applied.
+        """
+        steps = self.depth() if steps is None else steps
+        values = self.initial_values(inputs)
+        if initial is not None:
+            values[:] = initial
+            for name, words in inputs.items():
+                values[self.wires[name]] = words
+        gates = self.gate_arrays()
+        timeline = np.empty((steps + 1,) + values.shape, dtype=np.uint64)
+        timeline[0] = values
+        for step in range(1, steps + 1):
+            previous = timeline[step - 1]
+            current = timeline[step]
+            current[:] = previous
+            # every gate sees its inputs as they were one delay earlier
+            for operation, (outputs, in1, in2) in gates.items():
+                current[outputs] = self.OPERATIONS[operation](
+                    previous[in1], previous[in2]
+                )
+        return timeline
+
+
+def subtractor_network(n_bits):
+    """
+    Return the network of a ripple borrow subtractor of n_bits stages, each
+    stage as drawn in subtractor_detailed_source. Stage i has inputs A{i},
+    B{i} and borrow R{i-1}, R-1 being the chain's borrow input, and outputs
+    S{i} = A xor B xor R and R{i} = R (not A + B) + (not A) B.
+    """
+    network = LogicNetwork()
+    network.input('R-1')
+    for i in range(n_bits):
+        network.input(f'A{i}')
+        network.input(f'B{i}')
+    for i in range(n_bits):
+        a, b, r = f'A{i}', f'B{i}', f'R{i - 1}'
+        network.gate('xor', f'X{i}', a, b)
+        network.gate('xor', f'S{i}', f'X{i}', r)
+        network.gate('not', f'NA{i}', a)
+        network.gate('or', f'O{i}', f'NA{i}', b)
+        network.gate('and', f'RO{i}', f'O{i}', r)
+        network.gate('and', f'NAB{i}', f'NA{i}', b)
+        network.gate('or', f'R{i}', f'RO{i}', f'NAB{i}')
+    return network
+
+
+def subtractor_inputs(network, a, b, n_bits, borrow=0):
+    """
+    Return the packed inputs of subtractor_network(n_bits) computing a - b
+    for each pair of integers of the arrays a and b.
+    """
+    a_bits = pack_bits(a, n_bits)
+    b_bits = pack_bits(b, n_bits)
+    inputs = {
+        'R-1': np.full(
+            a_bits.shape[1], ~np.uint64(0) if borrow else 0, dtype=np.uint64
+        ),
+    }
+    for i in range(n_bits):
+        inputs[f'A{i}'] = a_bits[i]
+        inputs[f'B{i}'] = b_bits[i]
+    return inputs
+
+
+class SignalWires(mn.VGroup):
+    """
+    Wires coloured after their logic values: `wires` is a multi-subpath
+    VMobject drawn in its own colour, over which the subpaths of the high
+    wires are drawn in on_color. The i-th wire has point_counts[i] points of
+    `wires`, and timeline is the (steps, n_wires) boolean values of the
+    wires, played step_duration seconds per step.
+    """
+    CONFIG = {
+        'on_color': mn.YELLOW,
+        'step_duration': 0.2,
+    }
+
+    def __init__(self, wires, point_counts, timeline, **kwargs):
+        self.wires = wires
+        self.wire_of_point = np.repeat(
+            np.arange(len(point_counts)), point_counts
+        )
+        self.timeline = timeline
+        self.time = 0
+        mn.VGroup.__init__(self, **kwargs)
+        self.on = mn.VMobject(
+            color=self.on_color,
+            stroke_width=wires.get_stroke_width() * 1.5,
+        )
+        self.add(wires, self.on)
+        self.set_step(0)
+        self.add_updater(lambda m, dt: m.advance(dt))
+
+    def set_timeline(self, timeline):
+        self.timeline = timeline
+        self.time = 0
+        return self.set_step(0)
+
+    def advance(self, dt):
+        self.time += dt
+        return self.set_step(int(self.time / self.step_duration))
+
+    def set_step(self, step):
+        high = self.timeline[min(step, len(self.timeline) - 1)]
+        # the wires' current points, so that the overlay follows whatever
+        # moved them
+        self.on.points = self.wires.points[high[self.wire_of_point]]
+        return self
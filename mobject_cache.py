@@ -0,0 +1,130 @@
+"""
+Content-addressed cache of the points of compiled vectorized mobjects,
+shared between runs and between concurrent render processes.
+
+Compiling a TikzMobject means a LaTeX run, a dvisvgm run and parsing the
+resulting SVG, all of it to get a tree of VMobjects and their points. Those
+points are stored as a raw .npy array next to a small index describing the
+tree, and loaded back memory-mapped, straight into the mobjects' points.
+"""
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+import manimlib.constants as consts
+import manimlib.imports as mn
+import numpy as np
+
+
+class CachedPoints:
+    """
+    Points of a family of VMobjects, the i-th family member (in get_family()
+    order) having points[offsets[i]:offsets[i + 1]] and parents[i] as the
+    index of its parent, -1 for the root.
+    """
+    def __init__(self, points, offsets, parents):
+        self.points = points
+        self.offsets = offsets
+        self.parents = parents
+
+    @classmethod
+    def from_mobject(cls, mobject):
+        family = mobject.get_family()
+        index = {id(member): i for i, member in enumerate(family)}
+        parents = np.full(len(family), -1, dtype=np.int64)
+        for i, member in enumerate(family):
+            for submobject in member.submobjects:
+                parents[index[id(submobject)]] = i
+        lengths = [len(member.points) for member in family]
+        return cls(
+            np.concatenate([member.points for member in family])
+            .reshape(-1, 3),
+            np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            parents,
+        )
+
+    def restore(self, mobject):
+        """
+        Rebuild the cached family under `mobject`, an empty VMobject that will
+        be its root. Styles aren't cached, they are left to the root's
+        init_colors.
+        """
+        family = [mobject]
+        for i, parent in enumerate(self.parents):
+            member = mobject if i == 0 else mn.VMobject()
+            member.points = self.points[self.offsets[i]:self.offsets[i + 1]]
+            if i > 0:
+                family.append(member)
+                family[parent].add(member)
+        return mobject
+
+
+class MobjectCache:
+    """
+    On-disk store of CachedPoints. Each entry is a <key>.npy file holding the
+    points, committed by writing the <key>.npz index last.
+    """
+    def __init__(self, name, directory=None):
+        self.name = name
+        self._directory = directory
+
+    @property
+    def directory(self):
+        # resolved lazily, manim only sets up its media directory after our
+        # scene modules are imported
+        if self._directory is None:
+            self._directory = os.path.join(
+                consts.MEDIA_DIR or './media', self.name
+            )
+        os.makedirs(self._directory, exist_ok=True)
+        return self._directory
+
+    @staticmethod
+    def key(*parts):
+        hasher = hashlib.sha256()
+        for part in parts:
+            hasher.update(str(part).encode())
+            hasher.update(b'\0')
+        return hasher.hexdigest()
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    @contextmanager
+    def lock(self, key):
+        """
+        Hold an exclusive lock on an entry, so that concurrent processes
+        needing the same mobject only compile it once.
+        """
+        with open(self.path(key, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, key):
+        try:
+            with np.load(self.path(key, '.npz')) as index:
+                offsets, parents = index['offsets'], index['parents']
+            # copy-on-write, as manim updates points in place
+            points = np.load(self.path(key, '.npy'), mmap_mode='c')
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            return None
+        return CachedPoints(points, offsets, parents)
+
+    def store(self, key, mobject):
+        cached = CachedPoints.from_mobject(mobject)
+        # write then rename so that readers never see partial files
+        suffix = f'.{os.getpid()}.tmp'
+        for extension, write in [
+                ('.npy', lambda f: np.save(f, cached.points)),
+                ('.npz', lambda f: np.savez(
+                    f, offsets=cached.offsets, parents=cached.parents)),
+                ]:
+            path = self.path(key, extension)
+            with open(path + suffix, 'wb') as f:
+                write(f)
+            os.replace(path + suffix, path)
+        return cached
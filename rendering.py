@@ -0,0 +1,397 @@
+"""
+Scene mixins cutting the cost of re-rendering scenes.
+
+Mix them in before the manim scene class, in this order, e.g.
+class Automaton(SegmentCache, StaticWait, FrozenBackground, mn.Scene).
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import types
+
+import manimlib.imports as mn
+import numpy as np
+from manimlib.utils.iterables import list_update
+
+from instancing import Instance
+from mobject_cache import MobjectCache
+
+
+def rendered_state(member):
+    """
+    Return what the camera draws of a single mobject, without its
+    submobjects: the kind of mobject it displays it as, its points and its
+    style.
+    """
+    state = [member.points]
+    if isinstance(member, Instance):
+        template = member.template
+        state += ['Instance', template.points, template.runs,
+                  member.instance_color, member.instance_opacity]
+    elif isinstance(member, mn.VMobject):
+        state += [
+            'VMobject', member.get_fill_rgbas(), member.get_stroke_rgbas(),
+            member.get_stroke_rgbas(background=True),
+            member.get_stroke_width(),
+            member.get_stroke_width(background=True),
+        ]
+    elif isinstance(member, mn.PMobject):
+        state += ['PMobject', member.rgbas, member.stroke_width]
+    elif isinstance(member, mn.AbstractImageMobject):
+        state += ['ImageMobject', member.get_pixel_array()]
+    if member.updaters:
+        # as well as the attributes updaters may read, e.g. a time counter
+        state += [member.updaters, {
+            key: value for key, value in vars(member).items()
+            if isinstance(value, (np.ndarray, str, int, float, bool))
+        }]
+    return state
+
+
+def state_digest(*values):
+    """
+    Return a hash of the state of the given values, e.g. animations and the
+    scene's mobjects: the arrays, numbers and strings found by walking into
+    containers and object attributes. Mobjects only contribute how their
+    family renders, so that equivalent mobjects built differently, say
+    compiled or loaded from a cache, hash the same. Functions, such as rate
+    functions and updaters, are hashed by their qualified names, default
+    arguments and the values they close over.
+    """
+    hasher = hashlib.sha256()
+    seen = {}
+
+    def update(value):
+        if isinstance(value, np.ndarray):
+            hasher.update(f'{value.dtype}{value.shape}'.encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (str, int, float, bool, type(None),
+                                np.generic)):
+            hasher.update(repr(value).encode())
+        elif isinstance(value, (list, tuple)):
+            hasher.update(b'[')
+            for item in value:
+                update(item)
+            hasher.update(b']')
+        elif isinstance(value, dict):
+            hasher.update(b'{')
+            for key in sorted(value, key=str):
+                update(key)
+                update(value[key])
+            hasher.update(b'}')
+        elif isinstance(value, (set, frozenset)):
+            update(sorted(value, key=repr))
+        elif isinstance(value, (types.ModuleType, mn.Scene, mn.Camera)):
+            # closures over the scene mustn't hash its frames
+            hasher.update(type(value).__qualname__.encode())
+        elif id(value) in seen:
+            # shared references, e.g. an animation's mobject
+            hasher.update(f'@{seen[id(value)]}'.encode())
+        elif callable(value) and hasattr(value, '__qualname__'):
+            seen[id(value)] = len(seen)
+            hasher.update(value.__qualname__.encode())
+            update(getattr(value, '__defaults__', None))
+            update(getattr(value, '__kwdefaults__', None))
+            cells = getattr(value, '__closure__', None) or ()
+            update([
+                cell.cell_contents for cell in cells
+                if cell.cell_contents is not value
+            ])
+            update(getattr(value, '__self__', None))
+        elif isinstance(value, mn.Mobject):
+            family = value.get_family()
+            for member in family:
+                seen.setdefault(id(member), len(seen))
+            update([
+                [len(member.submobjects)] + rendered_state(member)
+                for member in family
+            ])
+        else:
+            seen[id(value)] = len(seen)
+            hasher.update(type(value).__qualname__.encode())
+            update(getattr(value, '__dict__', None))
+        hasher.update(b'\0')
+
+    for value in values:
+        update(value)
+    return hasher.hexdigest()
+
+
+class SegmentCache:
+    """
+    Scene mixin caching the partial movie file of every play and wait call,
+    keyed by the state of the scene's mobjects going in, the animations and
+    the camera's configuration.
+
+    When a key is found, the cached file is copied in place of the segment,
+    and the animations are stepped through without rasterizing anything so
+    that the scene ends up in the same state. manim concatenates the partial
+    movie files without re-encoding them.
+
+    The code of updaters and of animation classes isn't part of the key,
+    only their names and the values they close over: clear
+    media/partial_movie_cache after changing them.
+    """
+    segments = MobjectCache('partial_movie_cache')
+
+    def caching_segments(self):
+        writer = self.file_writer
+        return writer.write_to_movie and not writer.livestreaming \
+            and not self.skip_animations
+
+    def segment_key(self, *parts):
+        camera = self.camera
+        camera_config = {
+            key: value for key, value in vars(camera).items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        return state_digest(
+            *parts,
+            type(camera).__qualname__, camera_config, camera.background,
+            camera.get_frame_width(), camera.get_frame_height(),
+            camera.get_frame_center(),
+            self.file_writer.movie_file_extension,
+            self.mobjects, self.foreground_mobjects,
+        )
+
+    def segment_path(self, key):
+        return self.segments.path(key, self.file_writer.movie_file_extension)
+
+    def replay_segment(self, key, simulate):
+        """
+        Use the cached segment of the given key as the next partial movie
+        file, and run simulate to bring the scene to the state at its end.
+        Return whether the segment was cached.
+        """
+        if not os.path.exists(self.segment_path(key)):
+            return False
+        shutil.copyfile(
+            self.segment_path(key),
+            self.file_writer.get_next_partial_movie_path(),
+        )
+        simulate()
+        self.num_plays += 1
+        return True
+
+    def store_segment(self, key, partial_movie_path):
+        # copy then rename so that other processes never see partial files
+        path = self.segment_path(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        shutil.copyfile(partial_movie_path, temporary_path)
+        os.replace(temporary_path, path)
+
+    def frame_times(self, run_time):
+        # the frames the scene would render over run_time
+        return np.arange(0, run_time, 1 / self.camera.frame_rate)
+
+    def simulate_play(self, animations):
+        self.begin_animations(animations)
+        times = self.frame_times(self.get_run_time(animations))
+        last_t = 0
+        for t in times:
+            dt = t - last_t
+            last_t = t
+            for animation in animations:
+                animation.update_mobjects(dt)
+                animation.interpolate(t / animation.run_time)
+            self.update_mobjects(dt)
+        self.increment_time(len(times) / self.camera.frame_rate)
+        self.finish_animations(animations)
+
+    def simulate_wait(self, duration):
+        self.update_mobjects(dt=0)
+        if self.should_update_mobjects():
+            times = self.frame_times(duration)
+            last_t = 0
+            for t in times:
+                self.update_mobjects(t - last_t)
+                last_t = t
+            n_frames = len(times)
+        else:
+            n_frames = int(duration / (1 / self.camera.frame_rate))
+        self.increment_time(n_frames / self.camera.frame_rate)
+
+    def play(self, *args, **kwargs):
+        self.update_skipping_status()
+        if not args or not self.caching_segments():
+            return super().play(*args, **kwargs)
+        animations = self.compile_play_args_to_animation_list(
+            *args, **kwargs
+        )
+        key = self.segment_key('play', animations)
+        if self.replay_segment(key, lambda: self.simulate_play(animations)):
+            return
+        path = self.file_writer.get_next_partial_movie_path()
+        super().play(*animations)
+        self.store_segment(key, path)
+
+    def wait(self, duration=mn.DEFAULT_WAIT_TIME, stop_condition=None):
+        self.update_skipping_status()
+        if stop_condition is not None or not self.caching_segments():
+            return super().wait(duration, stop_condition)
+        key = self.segment_key('wait', duration)
+        if self.replay_segment(key, lambda: self.simulate_wait(duration)):
+            return self
+        path = self.file_writer.get_next_partial_movie_path()
+        super().wait(duration)
+        self.store_segment(key, path)
+        return self
+
+
+def encode_held_frame(file_writer, frame, n_frames, path):
+    """
+    Encode a movie file at path showing frame, an RGBA pixel array, for
+    n_frames frames, with the codec settings of manim's own partial movie
+    files. The frame is piped to ffmpeg once and looped by a filter, and the
+    encoder turns the repeated frames into skipped blocks.
+    """
+    camera = file_writer.scene.camera
+    temporary_path = os.path.splitext(path)[0] + '_temp' \
+        + file_writer.movie_file_extension
+    command = [
+        mn.FFMPEG_BIN,
+        '-y',
+        '-f', 'rawvideo',
+        '-s', f'{camera.get_pixel_width()}x{camera.get_pixel_height()}',
+        '-pix_fmt', 'rgba',
+        '-r', str(camera.frame_rate),
+        '-i', '-',
+        '-vf', f'loop=loop={n_frames - 1}:size=1:start=0',
+        '-frames:v', str(n_frames),
+        '-an',
+        '-loglevel', 'error',
+    ]
+    if file_writer.movie_file_extension == '.mov':
+        command += ['-vcodec', 'qtrle']
+    else:
+        command += ['-vcodec', 'libx264', '-pix_fmt', 'yuv420p']
+    result = subprocess.run(command + [temporary_path], input=frame.tobytes())
+    if result.returncode != 0:
+        raise Exception(f'ffmpeg error encoding a held frame into {path}')
+    shutil.move(temporary_path, path)
+
+
+class StaticWait:
+    """
+    Scene mixin rendering wait calls during which nothing updates as a
+    single frame, which ffmpeg holds for the duration of the wait, rather
+    than rasterizing and piping the same frame over and over.
+    """
+    def wait(self, duration=mn.DEFAULT_WAIT_TIME, stop_condition=None):
+        self.update_skipping_status()
+        writer = self.file_writer
+        n_frames = int(duration / (1 / self.camera.frame_rate))
+        self.update_mobjects(dt=0)
+        if stop_condition is not None or self.should_update_mobjects() \
+                or self.skip_animations or not writer.write_to_movie \
+                or writer.livestreaming or n_frames == 0:
+            return super().wait(duration, stop_condition)
+        self.update_frame()
+        encode_held_frame(
+            writer, self.get_frame(), n_frames,
+            writer.get_next_partial_movie_path(),
+        )
+        self.increment_time(n_frames / self.camera.frame_rate)
+        self.num_plays += 1
+        return self
+
+
+class FrozenLayer:
+    """
+    Premultiplied RGBA pixels rasterized once, to be composited over frames.
+    Only the bounding box of its non transparent pixels is kept.
+    """
+    def __init__(self, pixels):
+        opaque = pixels[..., 3] > 0
+        rows = np.nonzero(opaque.any(axis=1))[0]
+        columns = np.nonzero(opaque.any(axis=0))[0]
+        if len(rows) == 0:
+            self.box = None
+            return
+        self.box = (
+            slice(rows[0], rows[-1] + 1), slice(columns[0], columns[-1] + 1)
+        )
+        self.pixels = pixels[self.box].astype(np.uint16)
+        self.transparency = 255 - self.pixels[..., 3:]
+
+    def composite(self, pixel_array):
+        if self.box is None:
+            return
+        region = pixel_array[self.box]
+        region[:] = self.pixels + (region * self.transparency + 127) // 255
+
+
+class FrozenBackground:
+    """
+    Scene mixin rasterizing the mobjects that no animation or updater moves
+    during a play call once, rather than on every frame.
+
+    The mobjects displayed before the first moving one make the background
+    every frame starts from, as in Scene.play, and those displayed after the
+    last moving one make a layer composited over every frame. Static
+    mobjects in between are still drawn every frame, to keep their order.
+    Nothing is frozen while the camera's frame moves.
+    """
+    def frozen_layers(self, animations):
+        """
+        Return the background pixels, the ids of the frozen mobjects and the
+        FrozenLayer over the others for the given animations, or None if
+        nothing can be frozen.
+        """
+        moving = set()
+        for mobject in [animation.mobject for animation in animations] + [
+                m for m in self.get_mobject_family_members() if m.updaters]:
+            moving.update(map(id, mobject.get_family()))
+        frame = getattr(self.camera, 'frame', None)
+        if frame is not None and (
+                id(frame) in moving or frame.get_family_updaters()):
+            return None
+
+        displayed = self.camera.get_mobjects_to_display(
+            list_update(self.mobjects, self.foreground_mobjects)
+        )
+        moving_indices = [
+            i for i, mobject in enumerate(displayed) if id(mobject) in moving
+        ]
+        first = moving_indices[0] if moving_indices else len(displayed)
+        last = moving_indices[-1] + 1 if moving_indices else len(displayed)
+        if first == 0 and last == len(displayed):
+            return None
+
+        self.update_frame(displayed[:first], include_submobjects=False)
+        background = self.get_frame()
+        self.update_frame(
+            displayed[last:], np.zeros_like(background),
+            include_submobjects=False,
+        )
+        frozen = set(map(id, displayed[:first] + displayed[last:]))
+        return background, frozen, FrozenLayer(self.get_frame())
+
+    def progress_through_animations(self, animations):
+        layers = None if self.skip_animations \
+            else self.frozen_layers(animations)
+        if layers is None:
+            return super().progress_through_animations(animations)
+        background, frozen, overlay = layers
+        last_t = 0
+        for t in self.get_animation_time_progression(animations):
+            dt = t - last_t
+            last_t = t
+            for animation in animations:
+                animation.update_mobjects(dt)
+                alpha = t / animation.run_time
+                animation.interpolate(alpha)
+            self.update_mobjects(dt)
+            # extracted again every frame, updaters may replace submobjects
+            moving_mobjects = [
+                mobject for mobject in self.camera.get_mobjects_to_display(
+                    list_update(self.mobjects, self.foreground_mobjects)
+                )
+                if id(mobject) not in frozen
+            ]
+            self.update_frame(
+                moving_mobjects, background, include_submobjects=False
+            )
+            overlay.composite(self.camera.pixel_array)
+            self.add_frames(self.get_frame())
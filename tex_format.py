@@ -0,0 +1,157 @@
+"""
+Precompiled LaTeX formats, one per distinct preamble.
+
+Loading the packages of our templates (tikz and its libraries, physics,
+microtype...) is most of the time LaTeX spends on a small label. Each
+preamble is loaded once in an initex run and dumped to a .fmt file with the
+mylatexformat package, and every later compile using the same preamble
+starts from that format instead, skipping the preamble entirely.
+
+Formats are keyed by a hash of the preamble and of the LaTeX version, so
+they're rebuilt whenever a template changes. install() makes manim's own
+TexMobject and TextMobject compiles use them too.
+"""
+import hashlib
+import os
+import subprocess
+import threading
+import warnings
+from functools import lru_cache
+
+import manimlib.constants as consts
+from manimlib.utils.tex_file_writing import dvi_to_svg, generate_tex_file
+
+
+@lru_cache(maxsize=None)
+def latex_version():
+    result = subprocess.run(
+        ['latex', '--version'], stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL, universal_newlines=True,
+    )
+    return result.stdout.split('\n', 1)[0]
+
+
+def template_preamble(template_tex_file_body):
+    return template_tex_file_body.split('\\begin{document}', 1)[0]
+
+
+def format_name(template_tex_file_body):
+    hasher = hashlib.sha256()
+    for part in (latex_version(), template_preamble(template_tex_file_body)):
+        hasher.update(part.encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()[:16] + '.preamble'
+
+
+def build_format(template_tex_file_body):
+    """
+    Dump the preamble of the template into a format file in TEX_DIR, and
+    return its path without the .fmt extension, as latex' -fmt option
+    expects it.
+    """
+    name = format_name(template_tex_file_body)
+    base = os.path.join(consts.TEX_DIR, name)
+    if os.path.exists(base + '.fmt'):
+        return base
+
+    # several processes, or threads of a TexPool, may build the same format
+    # at the same time, each one dumps its own file and moves it in place
+    # atomically
+    job = f'{name}.{os.getpid()}.{threading.get_ident()}'
+    source = os.path.join(consts.TEX_DIR, job + '.tex')
+    with open(source, 'w', encoding='utf-8') as outfile:
+        outfile.write(template_tex_file_body)
+    exit_code = subprocess.call(
+        [
+            'latex', '-ini',
+            '-interaction=batchmode',
+            '-halt-on-error',
+            f'-jobname={job}',
+            f'-output-directory={consts.TEX_DIR}',
+            '&latex', 'mylatexformat.ltx', source,
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    if exit_code != 0:
+        raise Exception(
+            'Latex error dumping format. '
+            f'See the log file: {os.path.join(consts.TEX_DIR, job)}.log'
+        )
+    os.replace(os.path.join(consts.TEX_DIR, job + '.fmt'), base + '.fmt')
+    return base
+
+
+_formats = {}
+_formats_lock = threading.Lock()
+
+
+def preamble_format(template_tex_file_body):
+    """
+    Return the format to compile documents built from the given template
+    with, or None if it can't be built, in which case they're compiled the
+    usual way.
+    """
+    name = format_name(template_tex_file_body)
+    # compiling threads wait for the format rather than each building it
+    with _formats_lock:
+        if name not in _formats:
+            try:
+                _formats[name] = build_format(template_tex_file_body)
+            except Exception as exception:
+                warnings.warn(f'Not using a precompiled format: {exception}')
+                _formats[name] = None
+        return _formats[name]
+
+
+def latex_command(tex_file, template_tex_file_body, output_directory=None):
+    """
+    Return the latex command compiling tex_file, a document built from the
+    given template, to DVI.
+    """
+    command = [
+        'latex',
+        '-interaction=batchmode',
+        '-halt-on-error',
+        f'-output-directory={output_directory or consts.TEX_DIR}',
+    ]
+    fmt = preamble_format(template_tex_file_body)
+    if fmt is not None:
+        command.append(f'-fmt={fmt}')
+    return command + [tex_file]
+
+
+def tex_to_dvi(tex_file, template_tex_file_body):
+    result = tex_file.replace('.tex', '.dvi')
+    if not os.path.exists(result):
+        exit_code = subprocess.call(
+            latex_command(tex_file, template_tex_file_body),
+            stdout=subprocess.DEVNULL,
+        )
+        if exit_code != 0:
+            raise Exception(
+                'Latex error converting to dvi. '
+                f'See the log file: {tex_file.replace(".tex", ".log")}'
+            )
+    return result
+
+
+def tex_to_svg_file(expression, template_tex_file_body):
+    """
+    Drop-in replacement for manim's tex_to_svg_file, compiling from the
+    template's precompiled format.
+    """
+    tex_file = generate_tex_file(expression, template_tex_file_body)
+    dvi_file = tex_to_dvi(tex_file, template_tex_file_body)
+    return dvi_to_svg(dvi_file)
+
+
+def install():
+    """
+    Make manim's TexMobject, TextMobject and subclasses compile from
+    precompiled formats.
+    """
+    # xelatex, used for ctex, has its own formats, leave it alone
+    if consts.TEX_USE_CTEX:
+        return
+    import manimlib.mobject.svg.tex_mobject as tex_mobject
+    tex_mobject.tex_to_svg_file = tex_to_svg_file
@@ -0,0 +1,264 @@
+"""
+Batched LaTeX compilation of many small labels.
+
+Building a TextMobject costs a LaTeX run and a dvisvgm run, which adds up
+quickly for graphs with dozens of node and edge labels. Here every label
+that isn't compiled yet goes into a single multi-page standalone document,
+one page per label, which dvisvgm splits back into one SVG file per label.
+"""
+import hashlib
+import os
+import re
+import subprocess
+from collections import OrderedDict
+
+import manimlib.constants as consts
+import manimlib.imports as mn
+from manimlib.mobject.svg.tex_mobject import TEX_MOB_SCALE_FACTOR
+from manimlib.utils.config_ops import digest_config
+
+from tex_format import latex_command
+
+
+# name of the environment wrapping each label, see standalone's `multi`
+# option
+LABEL_ENVIRONMENT = 'mnlabel'
+
+
+def label_hash(expression, template_tex_file_body):
+    hasher = hashlib.sha256()
+    hasher.update((expression + template_tex_file_body).encode())
+    return hasher.hexdigest()[:16]
+
+
+def label_svg_path(expression, template_tex_file_body):
+    return os.path.join(
+        consts.TEX_DIR,
+        label_hash(expression, template_tex_file_body) + '.label.svg'
+    )
+
+
+def batch_document(expressions, template_tex_file_body):
+    """
+    Build a standalone document typesetting each expression on its own page,
+    in the same way the template would typeset it alone.
+    """
+    preamble, rest = template_tex_file_body.split('\\begin{document}', 1)
+    body, postamble = rest.rsplit('\\end{document}', 1)
+
+    preamble, n = re.subn(
+        r'\\documentclass\[([^\]]*)\]\{standalone\}',
+        rf'\\documentclass[\1,multi={LABEL_ENVIRONMENT}]{{standalone}}',
+        preamble,
+        count=1,
+    )
+    if n == 0:
+        raise ValueError(
+            'Batched labels need a template using the standalone class'
+        )
+
+    pages = [
+        f'\\begin{{{LABEL_ENVIRONMENT}}}'
+        + body.replace(consts.TEX_TEXT_TO_REPLACE, expression)
+        + f'\\end{{{LABEL_ENVIRONMENT}}}\n'
+        for expression in expressions
+    ]
+    return ''.join([
+        preamble, '\\begin{document}\n', *pages, '\\end{document}',
+        postamble,
+    ])
+
+
+def compile_labels(expressions, template_tex_file_body):
+    """
+    Return the SVG file of each of the given LaTeX expressions, compiling
+    all of those that weren't compiled before in a single LaTeX run and a
+    single dvisvgm run.
+    """
+    paths = [
+        label_svg_path(expression, template_tex_file_body)
+        for expression in expressions
+    ]
+    missing = {}
+    for expression, path in zip(expressions, paths):
+        if not os.path.exists(path):
+            missing[expression] = path
+    if not missing:
+        return paths
+
+    batch = list(missing)
+    # several processes may compile the same batch at the same time, each
+    # one works on its own files and the resulting labels are moved in place
+    # atomically
+    base = os.path.join(
+        consts.TEX_DIR,
+        label_hash('\0'.join(batch), template_tex_file_body)
+        + f'.{os.getpid()}.batch'
+    )
+    document = batch_document(batch, template_tex_file_body)
+    with open(base + '.tex', 'w', encoding='utf-8') as outfile:
+        outfile.write(document)
+
+    # the batch preamble gets its own precompiled format
+    exit_code = subprocess.call(
+        latex_command(base + '.tex', document),
+        stdout=subprocess.DEVNULL,
+    )
+    if exit_code != 0:
+        raise Exception(
+            'Latex error converting to dvi. '
+            f'See the log file: {base}.log'
+        )
+    subprocess.call(
+        [
+            'dvisvgm', base + '.dvi',
+            '--page=1-', '-n', '-v', '0',
+            '-o', base + '-%4p.svg',
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+
+    # dvisvgm wrote one numbered file per page, in the labels' order
+    for page, expression in enumerate(batch, start=1):
+        os.replace(f'{base}-{page:04}.svg', missing[expression])
+    return paths
+
+
+class LabelMobject(mn.SingleStringTexMobject):
+    """
+    A TextMobject-like label built from an SVG file compiled by
+    compile_labels rather than by its own LaTeX run.
+    """
+    CONFIG = {
+        'template_tex_file_body': mn.TEMPLATE_TEXT_FILE_BODY,
+        'alignment': '\\centering',
+    }
+
+    def __init__(self, tex_string, file_name, **kwargs):
+        digest_config(self, kwargs)
+        self.tex_string = tex_string
+        mn.SVGMobject.__init__(self, file_name=file_name, **kwargs)
+        if self.height is None:
+            self.scale(TEX_MOB_SCALE_FACTOR)
+        if self.organize_left_to_right:
+            self.organize_submobjects_left_to_right()
+        # the parsed SVG definitions are useless once the glyphs are built,
+        # dropping them keeps labels cheap to copy and to send between
+        # processes
+        self.ref_to_element = {}
+
+
+class MathLabelMobject(LabelMobject):
+    """
+    A TexMobject-like label, see LabelMobject.
+    """
+    CONFIG = {
+        'template_tex_file_body': mn.TEMPLATE_TEX_FILE_BODY,
+        'alignment': '',
+    }
+
+
+def label_expressions(tex_strings, label_class=LabelMobject, **kwargs):
+    """
+    Return the LaTeX expressions label_class would typeset for the given
+    strings, and its template.
+    """
+    # resolve the effective template and alignment without building anything
+    config = label_class.__new__(label_class)
+    digest_config(config, kwargs)
+    expressions = [
+        config.get_modified_expression(tex_string)
+        for tex_string in tex_strings
+    ]
+    return expressions, config.template_tex_file_body
+
+
+def label_files(tex_strings, label_class=LabelMobject, **kwargs):
+    """
+    Return the SVG file of each of the given strings as label_class would
+    typeset it, compiling all of them at once.
+    """
+    return compile_labels(
+        *label_expressions(tex_strings, label_class, **kwargs)
+    )
+
+
+def label_mobjects(tex_strings, label_class=LabelMobject, **kwargs):
+    """
+    Build one label_class mobject per given string, compiling all of them at
+    once.
+    """
+    paths = label_files(tex_strings, label_class, **kwargs)
+    return [
+        label_class(tex_string, path, **kwargs)
+        for tex_string, path in zip(tex_strings, paths)
+    ]
+
+
+class LabelFactory:
+    """
+    Memoizing label_class builder. Built labels are kept in a bounded LRU,
+    keyed by expression, template and scale, and handed out as copies, which
+    is much cheaper than parsing their SVG files again. The hits and misses
+    counters help sizing max_size.
+
+    Missing labels are compiled all at once by svg_files, a function mapping
+    a list of expressions and a template to their SVG files.
+    """
+    def __init__(self, label_class=LabelMobject, max_size=1024,
+                 svg_files=compile_labels, **kwargs):
+        self.label_class = label_class
+        self.max_size = max_size
+        self.svg_files = svg_files
+        self.kwargs = kwargs
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def labels(self, tex_strings, scale=1):
+        """
+        Return one label per given string, scaled by scale, which is either
+        a number or one number per string.
+        """
+        if isinstance(scale, (int, float)):
+            scale = [scale] * len(tex_strings)
+        expressions, template = label_expressions(
+            tex_strings, self.label_class, **self.kwargs
+        )
+        keys = [
+            (expression, template, s)
+            for expression, s in zip(expressions, scale)
+        ]
+
+        missing = OrderedDict()
+        for tex_string, key in zip(tex_strings, keys):
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+            elif key in missing:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing[key] = tex_string
+        if missing:
+            paths = self.svg_files([key[0] for key in missing], template)
+            for (key, tex_string), path in zip(missing.items(), paths):
+                label = self.label_class(tex_string, path, **self.kwargs)
+                if key[2] != 1:
+                    label.scale(key[2])
+                self.cache[key] = label
+
+        labels = [self.cache[key].copy() for key in keys]
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return labels
+
+    def label(self, tex_string, scale=1):
+        return self.labels([tex_string], scale)[0]
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+
+default_factory = LabelFactory()
@@ -0,0 +1,133 @@
+"""
+Long-lived pool of TeX workers.
+
+Snippets are submitted to a local queue and get a future of their SVG file.
+Worker threads, one per core, drain the queue and compile whatever is pending
+with compile_labels, many snippets per LaTeX run, so that a scene can ask for
+all of its formulas up front and wait for them together rather than running
+LaTeX and dvisvgm once per TexMobject.
+"""
+import math
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from tex_labels import (
+    LabelMobject, MathLabelMobject, compile_labels, label_expressions,
+)
+
+
+class TexPool:
+    """
+    Compiles submitted (expression, template) snippets on `workers` threads,
+    each LaTeX run taking at most batch_size of them.
+    """
+    def __init__(self, workers=None, batch_size=32):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._pid = None
+
+    def _start(self):
+        # threads don't survive forks, each process gets its own workers
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = {}
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, expression, template_tex_file_body):
+        """
+        Return a future of the SVG file of the given expression typeset with
+        the given template.
+        """
+        self._start()
+        key = (expression, template_tex_file_body)
+        with self.lock:
+            # the same snippet is only compiled once, however many times it's
+            # asked for while being compiled
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = Future()
+                self.queue.put(key)
+        return future
+
+    def svg_files(self, expressions, template_tex_file_body):
+        """
+        Return the SVG file of each of the given expressions, compiling them
+        concurrently.
+        """
+        futures = [
+            self.submit(expression, template_tex_file_body)
+            for expression in expressions
+        ]
+        return [future.result() for future in futures]
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        # share what's waiting with the other workers rather than taking it
+        # all, so that a large request still runs on every core
+        size = min(
+            self.batch_size,
+            math.ceil((1 + self.queue.qsize()) / self.workers),
+        )
+        while len(batch) < size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            by_template = {}
+            for expression, template in batch:
+                by_template.setdefault(template, []).append(expression)
+            for template, expressions in by_template.items():
+                try:
+                    results = compile_labels(expressions, template)
+                    error = None
+                except Exception as exception:
+                    error = exception
+                with self.lock:
+                    futures = [
+                        self.pending.pop((expression, template))
+                        for expression in expressions
+                    ]
+                for i, future in enumerate(futures):
+                    if error is None:
+                        future.set_result(results[i])
+                    else:
+                        future.set_exception(error)
+
+    def tex_mobjects(self, tex_strings, label_class=MathLabelMobject,
+                     **kwargs):
+        """
+        Build one label_class mobject per given string, all of them compiled
+        concurrently. Strings are typeset as TexMobject does by default, pass
+        label_class=LabelMobject to typeset them as TextMobject does.
+        """
+        paths = self.svg_files(
+            *label_expressions(tex_strings, label_class, **kwargs)
+        )
+        return [
+            label_class(tex_string, path, **kwargs)
+            for tex_string, path in zip(tex_strings, paths)
+        ]
+
+
+default_pool = TexPool()
+
+
+def tex_mobjects(tex_strings, **kwargs):
+    return default_pool.tex_mobjects(tex_strings, **kwargs)
+
+
+def text_mobjects(text_strings, **kwargs):
+    return default_pool.tex_mobjects(
+        text_strings, label_class=LabelMobject, **kwargs
+    )